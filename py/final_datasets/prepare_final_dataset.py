@@ -3,43 +3,46 @@ import numpy as np
 import pandas as pd
 
 from py.utils.yadisk.yadisk_utils import get_dir_names
+from py.utils.geo.district_assignment import get_district_features
+from py.utils.general.partitioned_csv import read_date_window
+from py.utils.data_cleaning.last_seen_index import ensure_last_seen_summary, load_last_seen_summary
 from py.final_datasets.cols_order import (
     LONG_RENT_COLS,
     SALE_SECONDARY_COLS
 )
 
-def prepare_final_dataset(deal_type, start_dt, end_dt, days_to_follow, cols_order):
-
-    # data load
-    df = pd.read_csv(f"csv/prepared_data/offers_parsed/{deal_type}_cleaned.csv")
-
-    # start_dt filter
-    start_dt_mask = pd.to_datetime(df['first_creation_date']) >= pd.to_datetime(start_dt)
-    df = df[start_dt_mask].reset_index()
-
-    # end_dt filter
-    end_dt_mask = pd.to_datetime(df['first_creation_date']) <= pd.to_datetime(end_dt)
-    df = df[end_dt_mask].reset_index()
+# read on top of cols_order: needed for joins and derived columns
+JOIN_COLS = {'property_id', 'first_creation_date', 'ad_is_closed', 'lat', 'lng'}
+
+def load_final_inputs(deal_type, start_dt, end_dt, cols_order):
+    """
+    Cleaned offers created within [start_dt, end_dt] with last_seen_dttm, duration, ao and district,
+    i.e. everything of the final dataset except the cohort dependent is_censored.
+    """
+
+    # data load: only the months of [start_dt, end_dt] and only the output + join columns are parsed
+    df = read_date_window(
+        deal_type,
+        start_dt,
+        end_dt,
+        columns=set(cols_order) | JOIN_COLS,
+        fallback_path=f"csv/prepared_data/offers_parsed/{deal_type}_cleaned.csv",
+    )
 
 
-    # max(last_seen_dttm) for each by property ids
+    # max(last_seen_dttm) for each by property ids (maintained by clean_dataset, built here if missing)
+    ensure_last_seen_summary(deal_type)
     last_seen_df = (
-        pd.read_csv(f"csv/prepared_data/search_clean/{deal_type}.csv")
-            .query(f"ad_deal_type == '{deal_type}'")
-            .dropna(subset=['last_seen_dttm'])
-            [['property_id', 'last_seen_dttm']]
-            .groupby(['property_id'])
-            .agg(last_seen_dttm=('last_seen_dttm', 'max'))
-            .reset_index()
+        load_last_seen_summary(deal_type)
+            [['property_id', 'last_seen']]
+            .rename(columns={'last_seen': 'last_seen_dttm'})
     )
 
     # join to get last_seen_dttm
     df = df.merge(last_seen_df, how = 'inner', on='property_id')
 
-    # is_censored
     df['first_creation_date'] = pd.to_datetime(df['first_creation_date'])
     df['last_seen_dttm'] = pd.to_datetime(df['last_seen_dttm'])
-    df['is_censored'] = df['last_seen_dttm'] > (df['first_creation_date'] + pd.Timedelta(days=days_to_follow))
 
     # duration calc
     df['duration'] = (df['last_seen_dttm'] - df['first_creation_date']) / pd.Timedelta(hours=24)
@@ -50,13 +53,60 @@ def prepare_final_dataset(deal_type, start_dt, end_dt, days_to_follow, cols_orde
 
     df.loc[df['ad_is_closed'] == False, 'duration'] = None
 
-    # get ao and district cols
-    df = df.merge(pd.read_excel("xlsx/geo/processed/districts.xlsx").rename(columns = {"district_code": "search_alias"}), how = 'inner', on='search_alias')
+    # get ao and district cols (point in district polygon, cached per coords; rows outside all polygons are kept)
+    df = df.merge(get_district_features(df[['lng', 'lat']]), how = 'left', on=['lng', 'lat'])
+
+    return df
 
 
+def prepare_final_dataset(deal_type, start_dt, end_dt, days_to_follow, cols_order):
+
+    df = load_final_inputs(deal_type, start_dt, end_dt, cols_order)
+
+    # is_censored
+    df['is_censored'] = df['last_seen_dttm'] > (df['first_creation_date'] + pd.Timedelta(days=days_to_follow))
+
     df[cols_order].to_csv(f"csv/final_datasets/{deal_type}.csv", index = False)
 
 
+def prepare_final_datasets_cohorts(deal_type, cohorts, cols_order, single_file=False):
+    """
+    Final datasets for many cohorts from one load:
+        cohorts: list of (start_dt, end_dt, days_to_follow)
+    Inputs are read and joined once for the union of the windows; cohort membership and
+    is_censored are (n_rows, n_cohorts) boolean matrices computed by broadcasting.
+    Writes csv/final_datasets/cohorts/{deal_type}_{start_dt}_{end_dt}_{days_to_follow}.csv per cohort,
+    or a single csv/final_datasets/{deal_type}_cohorts.csv with a 'cohort' key column if single_file.
+    """
+    starts = pd.to_datetime([c[0] for c in cohorts]).to_numpy()
+    ends = pd.to_datetime([c[1] for c in cohorts]).to_numpy()
+    follow = pd.to_timedelta([c[2] for c in cohorts], unit='D').to_numpy()
+    cohort_keys = [f"{start_dt}_{end_dt}_{days_to_follow}" for start_dt, end_dt, days_to_follow in cohorts]
+
+    df = load_final_inputs(deal_type, starts.min(), ends.max(), cols_order)
+
+    first_dt = df['first_creation_date'].to_numpy()[:, None]
+    last_seen = df['last_seen_dttm'].to_numpy()[:, None]
+
+    is_member = (first_dt >= starts[None, :]) & (first_dt <= ends[None, :])
+    is_censored = last_seen > (first_dt + follow[None, :])
+
+    if single_file:
+        cols, rows = np.nonzero(is_member.T)  # grouped by cohort
+        out_df = df.iloc[rows].reset_index(drop=True)
+        out_df['is_censored'] = is_censored[rows, cols]
+        out_df.insert(0, 'cohort', np.asarray(cohort_keys, dtype=object)[cols])
+        out_df[['cohort'] + cols_order].to_csv(f"csv/final_datasets/{deal_type}_cohorts.csv", index = False)
+        return
+
+    os.makedirs("csv/final_datasets/cohorts", exist_ok=True)
+    for j, cohort_key in enumerate(cohort_keys):
+        member = is_member[:, j]
+        cohort_df = df[member].copy()
+        cohort_df['is_censored'] = is_censored[member, j]
+        cohort_df[cols_order].to_csv(f"csv/final_datasets/cohorts/{deal_type}_{cohort_key}.csv", index = False)
+
+
 def get_dirs_csv():
 
     deal_types = ['long_rent', 'sale_secondary']
@@ -78,9 +128,10 @@ def get_dirs_csv():
     df.to_csv("csv/final_datasets/photo_dirs.csv", index = False)
 
 
-start_dt = '2025-07-01'
-end_dt = '2025-08-15'
+if __name__ == "__main__":
+    start_dt = '2025-07-01'
+    end_dt = '2025-08-15'
 
-prepare_final_dataset('long_rent', start_dt, end_dt, 45, LONG_RENT_COLS)
-prepare_final_dataset('sale_secondary', start_dt, end_dt, 90, SALE_SECONDARY_COLS)
-get_dirs_csv()
+    prepare_final_dataset('long_rent', start_dt, end_dt, 45, LONG_RENT_COLS)
+    prepare_final_dataset('sale_secondary', start_dt, end_dt, 90, SALE_SECONDARY_COLS)
+    get_dirs_csv()
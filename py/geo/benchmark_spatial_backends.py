@@ -0,0 +1,49 @@
+import pathlib
+import numpy as np
+import pandas as pd
+
+from py.utils.geo.coords_features_gen import (
+    CLEANED_OFFERS_PATH,
+    COUNT_THRESHOLDS,
+    STATIONS_PATH,
+    fix_lat_lng,
+    load_coords_dfs,
+)
+from py.utils.geo.spatial_backends import compare_spatial_backends
+
+OUT_DIR = pathlib.Path("csv/benchmarks")
+
+properties_coords_df, ads_coords_df = load_coords_dfs(CLEANED_OFFERS_PATH)
+stations_df = pd.read_excel(STATIONS_PATH)
+fix_lat_lng(stations_df, "lat", "lon")
+
+thresholds_m = np.array(list(COUNT_THRESHOLDS.keys()), dtype=np.float64)
+
+# same layers as in get_geo_features_df: stations by type + ads by deal type
+layers = {
+    station_type: (stations_df.query("station_type == @station_type"), 'lon')
+    for station_type in ['subway', 'mcd']
+}
+for deal_type, deal_type_df in ads_coords_df.groupby('ad_deal_type', observed=True):
+    layers[deal_type] = (deal_type_df, 'lng')
+
+timings_list, accuracy_list = [], []
+for layer, (objects_df, lng_col) in layers.items():
+    print(f"benchmarking {layer} ({len(objects_df)} objects, {len(properties_coords_df)} queries)")
+    timings, accuracy = compare_spatial_backends(
+        properties_coords_df['lat'], properties_coords_df['lng'],
+        objects_df['lat'], objects_df[lng_col],
+        thresholds_m,
+    )
+    timings_list.append(timings.assign(layer=layer))
+    accuracy_list.append(accuracy.assign(layer=layer))
+
+timings_df = pd.concat(timings_list, ignore_index=True)
+accuracy_df = pd.concat(accuracy_list, ignore_index=True).pivot(index='metric', columns='layer', values='value')
+
+print(timings_df.to_string(index=False))
+print(accuracy_df.to_string())
+
+OUT_DIR.mkdir(parents=True, exist_ok=True)
+timings_df.to_csv(OUT_DIR / "spatial_backends_timings.csv", index=False)
+accuracy_df.to_csv(OUT_DIR / "spatial_backends_accuracy.csv")
@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import networkx as nx
+import osmnx as ox
+import shapely
+
+from py.utils.geo.coords_features_gen import MOSCOW_CENTER, OSM_GPKG_LAYER, OSM_LABELS, compute_geo_features
+from py.utils.geo.tiled_geo_features import compute_geo_features_tiled
+
+# tiled vs single-pass engine on a small synthetic Moscow (stations, OSM features, walk graph):
+# same columns in the same order and the same values, walk features included
+N_PROPERTIES = 500
+N_ADS = 2_000
+N_STATIONS = 40
+SPREAD_DEG = 0.3
+TILE_SIZE_DEG = 0.1  # several tiles over the synthetic area
+GRID_STEP_DEG = 0.01  # walk graph: a street grid
+
+
+def _write_fixture(rng):
+    lat0, lng0 = MOSCOW_CENTER
+
+    stations_df = pd.DataFrame({
+        "station_type": np.where(np.arange(N_STATIONS) % 4 == 0, "mcd", "subway"),
+        "station_name": [f"station_{i}" for i in range(N_STATIONS)],
+        "line": [f"line_{i % 5}" for i in range(N_STATIONS)],
+        "lat": lat0 + rng.uniform(-SPREAD_DEG, SPREAD_DEG, N_STATIONS),
+        "lon": lng0 + rng.uniform(-SPREAD_DEG, SPREAD_DEG, N_STATIONS),
+    })
+    stations_df.to_excel("stations.xlsx", index=False)
+
+    features = []
+    for i, label in enumerate(OSM_LABELS * 5):
+        x, y = lng0 + rng.uniform(-SPREAD_DEG, SPREAD_DEG), lat0 + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+        geom = shapely.box(x, y, x + 0.01, y + 0.005) if i % 2 else shapely.LineString([(x, y), (x + 0.02, y + 0.01)])
+        features.append({"label": label, "geometry": geom})
+    gpd.GeoDataFrame(features, crs="EPSG:4326").to_file("features.gpkg", layer=OSM_GPKG_LAYER)
+
+    graph = nx.MultiDiGraph(crs="epsg:4326")
+    steps = np.arange(-SPREAD_DEG, SPREAD_DEG + 1e-9, GRID_STEP_DEG)
+    for i, dy in enumerate(steps):
+        for j, dx in enumerate(steps):
+            graph.add_node(i * len(steps) + j, x=lng0 + dx, y=lat0 + dy)
+    for i in range(len(steps)):
+        for j in range(len(steps)):
+            for di, dj in [(0, 1), (1, 0)]:
+                if i + di < len(steps) and j + dj < len(steps):
+                    u, v = i * len(steps) + j, (i + di) * len(steps) + j + dj
+                    length = GRID_STEP_DEG * (111_320.0 if di else 111_320.0 * np.cos(np.deg2rad(lat0)))
+                    graph.add_edge(u, v, length=length)
+                    graph.add_edge(v, u, length=length)
+    ox.save_graphml(graph, "walk.graphml")
+
+    ads_coords_df = pd.DataFrame({
+        "ad_deal_type": pd.Categorical(rng.choice(["long_rent", "sale_secondary"], N_ADS)),
+        "property_id": [str(i) for i in range(N_ADS)],
+        "lng": lng0 + rng.uniform(-SPREAD_DEG, SPREAD_DEG, N_ADS),
+        "lat": lat0 + rng.uniform(-SPREAD_DEG, SPREAD_DEG, N_ADS),
+    })
+    properties_coords_df = ads_coords_df.sample(N_PROPERTIES, random_state=0)[['lng', 'lat']].reset_index(drop=True)
+    return properties_coords_df, ads_coords_df
+
+
+def _compare(single_df, tiled_df):
+    if list(single_df.columns) != list(tiled_df.columns):
+        raise ValueError(
+            "column mismatch:\n"
+            f"  only single-pass: {sorted(set(single_df.columns) - set(tiled_df.columns))}\n"
+            f"  only tiled: {sorted(set(tiled_df.columns) - set(single_df.columns))}\n"
+            f"  single-pass order: {list(single_df.columns)}\n"
+            f"  tiled order: {list(tiled_df.columns)}"
+        )
+    if not single_df.index.equals(tiled_df.index):
+        raise ValueError("row mismatch")
+
+    walk_cols = [c for c in single_df.columns if "_walk_" in c]
+    if not walk_cols:
+        raise ValueError("no walk features computed, the walk graph was not picked up")
+
+    bad_cols = []
+    for col in single_df.columns:
+        a, b = single_df[col].to_numpy(), tiled_df[col].to_numpy()
+        if pd.api.types.is_numeric_dtype(single_df[col]):
+            same = np.allclose(a.astype(np.float64), b.astype(np.float64), rtol=1e-9, atol=1e-6, equal_nan=True)
+        else:
+            same = (pd.Series(a).fillna("<NA>") == pd.Series(b).fillna("<NA>")).all()
+        if not same:
+            bad_cols.append(col)
+    if bad_cols:
+        raise ValueError(f"value mismatch in {bad_cols}")
+
+    print(f"tiled == single-pass: {len(single_df)} rows, {len(single_df.columns)} columns, walk columns {walk_cols}")
+
+
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp:
+    # fixture files and the geo caches stay out of the working tree
+    os.chdir(tmp)
+    try:
+        properties_coords_df, ads_coords_df = _write_fixture(np.random.default_rng(0))
+        paths = dict(stations_path="stations.xlsx", gpkg_path="features.gpkg", walk_graph_path="walk.graphml")
+
+        single_df = compute_geo_features(properties_coords_df.copy(), ads_coords_df, use_cache=False, **paths)
+        tiled_df = compute_geo_features_tiled(properties_coords_df.copy(), ads_coords_df,
+                                              tile_size_deg=TILE_SIZE_DEG, **paths)
+        _compare(single_df, tiled_df)
+    finally:
+        os.chdir(cwd)
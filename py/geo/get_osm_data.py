@@ -3,10 +3,14 @@ import pandas as pd
 import geopandas as gpd
 import osmnx as ox
 import requests
+import shapely
 
 from shapely.geometry import LineString
 from shapely.ops import unary_union, polygonize
 
+from py.utils.geo.clipping import clip_within_region
+from py.utils.geo.osm_pbf import read_pbf_features, select_features
+
 PLACE = "Moscow, Russia"
 
 # MKAD in OSM (Moscow Ring Road)
@@ -22,6 +26,36 @@ ox.settings.requests_timeout = 180
 
 OVERPASS_URL = "https://overpass-api.de/api/interpreter"  # you can swap if needed
 
+# ---- SOURCE ----
+# "overpass": osmnx + Overpass API (network, rate limited)
+# "pbf": local extract (e.g. Geofabrik central-fed-district-latest.osm.pbf), fully offline
+OSM_SOURCE = "overpass"
+OSM_PBF_PATH = "osm/central-fed-district-latest.osm.pbf"
+
+# ---- TAG SETS ----
+TAGS_WATER = {
+    "waterway": ["river", "stream", "canal"],
+    "natural": "water",
+    "water": "river",
+}
+TAGS_INDUSTRIAL = {
+    "landuse": "industrial",
+    "building": "industrial",
+    "man_made": "works",
+    "industrial": True,
+}
+TAGS_ENERGY = {"power": ["plant", "generator"]}
+TAGS_WASTE = {
+    "man_made": ["wastewater_plant", "composting_plant"],
+    "amenity": ["waste_transfer_station", "recycling"],
+    "landuse": "landfill",
+}
+TAGS_GREEN = {
+    "leisure": ["park", "garden", "nature_reserve"],
+    "landuse": ["forest", "grass", "recreation_ground"],
+    "natural": ["wood", "grassland"],
+}
+
 # ---- GREEN FILTER THRESHOLDS ----
 GREEN_METRIC_EPSG = 32637              # UTM 37N (meters) for Moscow vicinity
 GREEN_MIN_WIDTH_M = 100.0
@@ -29,22 +63,25 @@ GREEN_MIN_LENGTH_M = 400.0
 GREEN_MIN_AREA_M2 = 0.5 * 1_000_000.0  # 0.5 km^2 = 500,000 m^2
 
 
-def _fetch(boundary, tags) -> gpd.GeoDataFrame:
+def _fetch(boundary, tags, pbf_features=None) -> gpd.GeoDataFrame:
     """
+    pbf_features given: select from the local extract (see read_pbf_features)
     OSMnx v2+: ox.features.features_from_polygon
     Fallback for older OSMnx: ox.geometries.geometries_from_polygon
     """
+    if pbf_features is not None:
+        return select_features(pbf_features, tags)
     if hasattr(ox, "features") and hasattr(ox.features, "features_from_polygon"):
         return ox.features.features_from_polygon(boundary, tags=tags)
     return ox.geometries.geometries_from_polygon(boundary, tags=tags)
 
 
-def _mk(boundary, label: str, tags: dict, post_filter=None) -> gpd.GeoDataFrame:
+def _mk(boundary, label: str, tags: dict, post_filter=None, pbf_features=None) -> gpd.GeoDataFrame:
     """
     Fetch features, optionally post-filter, return 2-col GeoDataFrame:
     label + coords (geometry).
     """
-    gdf = _fetch(boundary, tags)
+    gdf = _fetch(boundary, tags, pbf_features=pbf_features)
     if gdf.empty:
         return gpd.GeoDataFrame({"label": [], "coords": []}, geometry="coords", crs="EPSG:4326")
 
@@ -115,6 +152,14 @@ def get_mkad_polygon_wgs84(
         if not line.is_empty:
             lines.append(line)
 
+    return _polygonize_mkad(lines, metric_epsg)
+
+
+def _polygonize_mkad(lines, metric_epsg: int = 32637):
+    """
+    MKAD member ways linework -> largest enclosed polygon (EPSG:4326).
+    """
+    lines = [ln for ln in lines if ln is not None and not ln.is_empty]
     if not lines:
         raise RuntimeError("MKAD linework is empty after parsing ways.")
 
@@ -135,50 +180,38 @@ def filter_within_mkad(df: gpd.GeoDataFrame, mkad_poly_wgs84) -> gpd.GeoDataFram
     Keep only features strictly within the MKAD polygon.
     """
     df = df.set_geometry("coords")
-    df_wgs = df.to_crs("EPSG:4326") if df.crs else df.set_crs("EPSG:4326")
-
-    mkad = gpd.GeoSeries([mkad_poly_wgs84], crs="EPSG:4326").iloc[0]
-    mask = df_wgs.geometry.within(mkad)
-    return df_wgs[mask].copy()
+    return clip_within_region(df, mkad_poly_wgs84, region_crs="EPSG:4326")
 
 
 # -------------------- NEW: GREEN post-filter --------------------
 
-def _mrr_length_width_m(geom) -> tuple[float, float]:
+def _mrr_length_width_m(geoms) -> tuple[np.ndarray, np.ndarray]:
     """
-    Return (length, width) in meters based on the geometry's minimum rotated rectangle.
-    Expects geom in a metric CRS (meters).
+    Return (length, width) arrays in meters based on each geometry's minimum rotated rectangle.
+    Expects geoms in a metric CRS (meters). Array-level, no per-geometry Python.
     """
-    try:
-        if geom is None or geom.is_empty:
-            return 0.0, 0.0
-        # Try to fix minor invalidities (cheap)
-        if hasattr(geom, "is_valid") and not geom.is_valid:
-            geom = geom.buffer(0)
-        mrr = geom.minimum_rotated_rectangle  # oriented envelope :contentReference[oaicite:2]{index=2}
-        if mrr.geom_type != "Polygon":
-            return 0.0, 0.0
-
-        coords = list(mrr.exterior.coords)
-        if len(coords) < 5:
-            return 0.0, 0.0
-
-        # Rectangle exterior has 5 points (last == first). Use first 4 edges.
-        seglens = []
-        for i in range(4):
-            x1, y1 = coords[i]
-            x2, y2 = coords[i + 1]
-            seglens.append(float(np.hypot(x2 - x1, y2 - y1)))
-
-        seglens = [l for l in seglens if l > 0]
-        if not seglens:
-            return 0.0, 0.0
-
-        length = max(seglens)
-        width = min(seglens)
+    geoms = np.asarray(geoms, dtype=object)
+    length = np.zeros(len(geoms), dtype=np.float64)
+    width = np.zeros(len(geoms), dtype=np.float64)
+
+    # Fix minor invalidities, then oriented envelope (= minimum rotated rectangle)
+    mrr = shapely.oriented_envelope(shapely.make_valid(geoms))
+
+    # degenerate envelopes (points/lines) and missing geometries keep 0 x 0
+    is_rect = (shapely.get_type_id(mrr) == 3) & (shapely.get_num_coordinates(mrr) == 5)
+    if not is_rect.any():
         return length, width
-    except Exception:
-        return 0.0, 0.0
+
+    # Rectangle exterior has 5 points (last == first). Use first 4 edges.
+    coords = shapely.get_coordinates(shapely.get_exterior_ring(mrr[is_rect])).reshape(-1, 5, 2)
+    seglens = np.hypot(*np.moveaxis(np.diff(coords, axis=1), -1, 0))
+
+    positive = seglens > 0
+    length[is_rect] = np.where(positive, seglens, 0.0).max(axis=1)
+    width[is_rect] = np.where(positive, seglens, np.inf).min(axis=1)
+    width[~np.isfinite(width)] = 0.0
+
+    return length, width
 
 
 def green_filter(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
@@ -210,62 +243,55 @@ def green_filter(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
     if candidates.empty:
         return g.iloc[0:0].copy()
 
-    keep_idx = []
-    for idx, geom in candidates.geometry.items():
-        length_m, width_m = _mrr_length_width_m(geom)
-        if (length_m >= GREEN_MIN_LENGTH_M) and (width_m >= GREEN_MIN_WIDTH_M):
-            keep_idx.append(idx)
+    length_m, width_m = _mrr_length_width_m(candidates.geometry.to_numpy())
+    keep = (length_m >= GREEN_MIN_LENGTH_M) & (width_m >= GREEN_MIN_WIDTH_M)
 
-    return g.loc[keep_idx].copy()
+    return g.loc[candidates.index[keep]].copy()
 
 
-def build_moscow_labeled_df(place: str = PLACE) -> gpd.GeoDataFrame:
-    boundary_gdf = ox.geocode_to_gdf(place).to_crs("EPSG:4326")
-    boundary = boundary_gdf.geometry.iloc[0]
+def build_moscow_labeled_df(
+    place: str = PLACE,
+    source: str = OSM_SOURCE,
+    pbf_path: str = OSM_PBF_PATH,
+) -> gpd.GeoDataFrame:
 
-    # --- WATER
-    tags_water_union = {
-        "waterway": ["river", "stream", "canal"],
-        "natural": "water",
-        "water": "river",
-    }
+    if source not in {"overpass", "pbf"}:
+        raise ValueError(f"unknown source = '{source}', only 'overpass' and 'pbf' are supported")
 
+    if source == "pbf":
+        # one local pass for all tag sets + MKAD ways; final MKAD clip replaces the place boundary
+        pbf_features, mkad_lines = read_pbf_features(
+            pbf_path,
+            [TAGS_WATER, TAGS_INDUSTRIAL, TAGS_ENERGY, TAGS_WASTE, TAGS_GREEN],
+            boundary_relation_id=MKAD_RELATION_ID,
+        )
+        mkad_poly = _polygonize_mkad(mkad_lines)
+        boundary = None
+    else:
+        pbf_features = None
+        boundary_gdf = ox.geocode_to_gdf(place).to_crs("EPSG:4326")
+        boundary = boundary_gdf.geometry.iloc[0]
+
+    # --- WATER
     def water_filter(gdf):
         w = gdf.get("waterway", pd.Series(pd.NA, index=gdf.index))
         n = gdf.get("natural", pd.Series(pd.NA, index=gdf.index))
         wa = gdf.get("water", pd.Series(pd.NA, index=gdf.index))
         return gdf[w.isin(["river", "stream", "canal"]) | ((n == "water") & (wa == "river"))].copy()
 
-    water = _mk(boundary, "water", tags_water_union, post_filter=water_filter)
+    water = _mk(boundary, "water", TAGS_WATER, post_filter=water_filter, pbf_features=pbf_features)
 
     # --- INDUSTRIAL
-    tags_industrial = {
-        "landuse": "industrial",
-        "building": "industrial",
-        "man_made": "works",
-        "industrial": True,
-    }
-    industrial = _mk(boundary, "industrial_area", tags_industrial)
+    industrial = _mk(boundary, "industrial_area", TAGS_INDUSTRIAL, pbf_features=pbf_features)
 
     # --- ENERGY
-    tags_energy = {"power": ["plant", "generator"]}
-    energy = _mk(boundary, "energy", tags_energy)
+    energy = _mk(boundary, "energy", TAGS_ENERGY, pbf_features=pbf_features)
 
     # --- WASTE
-    tags_waste = {
-        "man_made": ["wastewater_plant", "composting_plant"],
-        "amenity": ["waste_transfer_station", "recycling"],
-        "landuse": "landfill",
-    }
-    waste = _mk(boundary, "waste", tags_waste)
+    waste = _mk(boundary, "waste", TAGS_WASTE, pbf_features=pbf_features)
 
     # --- GREEN (FILTERED by area + MRR dims)
-    tags_green = {
-        "leisure": ["park", "garden", "nature_reserve"],
-        "landuse": ["forest", "grass", "recreation_ground"],
-        "natural": ["wood", "grassland"],
-    }
-    green = _mk(boundary, "green", tags_green, post_filter=green_filter)
+    green = _mk(boundary, "green", TAGS_GREEN, post_filter=green_filter, pbf_features=pbf_features)
 
     combined = pd.concat([water, industrial, energy, waste, green], ignore_index=True)
     combined = gpd.GeoDataFrame(combined, geometry="coords", crs="EPSG:4326")
@@ -281,24 +307,26 @@ def build_moscow_labeled_df(place: str = PLACE) -> gpd.GeoDataFrame:
     )
 
     # --- FILTER: ONLY within MKAD
-    mkad_poly = get_mkad_polygon_wgs84()
+    if source == "overpass":
+        mkad_poly = get_mkad_polygon_wgs84()
     combined = filter_within_mkad(combined, mkad_poly)
 
     return combined
 
 
 # ---- RUN + MAP ----
-df = build_moscow_labeled_df()
-
-m = df.explore(
-    column="label",
-    categorical=True,
-    legend=True,
-    tooltip=["label"],
-)
+if __name__ == "__main__":
+    df = build_moscow_labeled_df(source=OSM_SOURCE)
+
+    m = df.explore(
+        column="label",
+        categorical=True,
+        legend=True,
+        tooltip=["label"],
+    )
 
-m.save("moscow_features_within_mkad.html")
-print("Saved: moscow_features_within_mkad.html")
+    m.save("moscow_features_within_mkad.html")
+    print("Saved: moscow_features_within_mkad.html")
 
-df.to_file("moscow_features_within_mkad.gpkg", layer="features", driver="GPKG")
-print("Saved: df to moscow_features_within_mkad.gpkg")
+    df.to_file("moscow_features_within_mkad.gpkg", layer="features", driver="GPKG")
+    print("Saved: df to moscow_features_within_mkad.gpkg")
@@ -0,0 +1,42 @@
+import re
+
+import geopandas as gpd
+import osmnx as ox
+import pandas as pd
+
+from py.utils.geo.district_assignment import DISTRICTS_POLYGONS_PATH
+
+# one-off, needs network access: Moscow okrugs (admin_level 5) and districts (admin_level 8) from OSM,
+# names matched to the processed districts.xlsx so ao / district values stay the same as before
+
+
+def normalize_name(s):
+    s = str(s).lower().replace('ё', 'е')
+    s = re.sub(r'\b(район|поселение|муниципальный округ|городской округ)\b', ' ', s)
+    return re.sub(r'[\s\-]+', ' ', s).strip()
+
+
+boundaries = ox.features_from_place("Moscow, Russia", tags={"boundary": "administrative"})
+boundaries = boundaries[boundaries.geometry.geom_type.isin(["Polygon", "MultiPolygon"])]
+boundaries = boundaries[['name', 'admin_level', 'geometry']].reset_index(drop=True)
+
+ao_gdf = boundaries.query("admin_level == '5'").rename(columns={"name": "osm_ao"})[['osm_ao', 'geometry']]
+districts_gdf = boundaries.query("admin_level == '8'").rename(columns={"name": "osm_district"})[['osm_district', 'geometry']]
+
+# okrug of each district by its representative point
+points_gdf = gpd.GeoDataFrame(districts_gdf[['osm_district']], geometry=districts_gdf.representative_point(), crs=districts_gdf.crs)
+districts_gdf['osm_ao'] = gpd.sjoin(points_gdf, ao_gdf, how='left', predicate='within')['osm_ao'].groupby(level=0).first()
+
+# names from districts.xlsx where they match
+xlsx_df = pd.read_excel("xlsx/geo/processed/districts.xlsx")[['ao', 'district', 'district_code']]
+xlsx_df['key'] = xlsx_df['district'].apply(normalize_name)
+districts_gdf['key'] = districts_gdf['osm_district'].apply(normalize_name)
+districts_gdf = districts_gdf.merge(xlsx_df.drop_duplicates(subset='key'), how='left', on='key')
+
+unmatched = districts_gdf['district'].isna()
+print(f"{int(unmatched.sum())} OSM districts not found in districts.xlsx, keeping OSM names")
+districts_gdf.loc[unmatched, 'ao'] = districts_gdf.loc[unmatched, 'osm_ao']
+districts_gdf.loc[unmatched, 'district'] = districts_gdf.loc[unmatched, 'osm_district']
+
+districts_gdf = gpd.GeoDataFrame(districts_gdf[['ao', 'district', 'district_code']], geometry=districts_gdf.geometry, crs="EPSG:4326")
+districts_gdf.to_file(DISTRICTS_POLYGONS_PATH, driver="GPKG")
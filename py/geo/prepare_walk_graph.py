@@ -0,0 +1,4 @@
+from py.utils.geo.walk_network import WALK_GRAPH_PATH, prepare_walk_graph
+
+# one-off, needs network access; the graph is then read from disk by get_geo_features_df
+prepare_walk_graph("Moscow, Russia", WALK_GRAPH_PATH)
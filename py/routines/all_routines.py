@@ -3,14 +3,15 @@ from py.utils.yadisk.refresh_local_yadisk_dirs import refresh_yadisk_dirs
 from py.utils.data_cleaning.data_cleaning import cleaning_routine
 from py.utils.general.dttm import time_print
 from py.utils.geo.coords_features_gen import get_geo_features_df
+from py.utils.geo.market_stats import get_market_stats_df
 
-def resfresh_local_db():
+def resfresh_local_db(restore_mode="full"):
     time_print("refreshing local mongodb")
-    refresh_local_backup()
+    refresh_local_backup(restore_mode)
 
-def refresh_yadisk_dirs_table():
+def refresh_yadisk_dirs_table(mode="incremental"):
     time_print("refreshing yadisk dirs data")
-    refresh_yadisk_dirs()
+    refresh_yadisk_dirs(mode)
 
 def do_cleaning_routine():
     time_print("cleaning parsed offers table")
@@ -19,3 +20,7 @@ def do_cleaning_routine():
 def compute_geo_features():
     time_print("computing geo features")
     get_geo_features_df()
+
+def compute_market_stats():
+    time_print("computing neighborhood market stats")
+    get_market_stats_df()
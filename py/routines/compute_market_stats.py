@@ -0,0 +1,2 @@
+from py.routines.all_routines  import compute_market_stats
+compute_market_stats()
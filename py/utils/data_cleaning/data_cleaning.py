@@ -7,9 +7,11 @@ import re
 
 from py.utils.data_cleaning.cols_order import cols_order
 from py.utils.data_cleaning.clean_price_history import clean_price_history
+from py.utils.data_cleaning.last_seen_index import update_last_seen_summary
 from py.utils.db_related.db_utils import query_table
 from py.utils.db_related.cmd_utils import start_db, stop_db
 from py.utils.general.dttm import time_print
+from py.utils.general.partitioned_csv import write_month_partitions
 from py.utils.geo.coords_features_gen import fix_lat_lng
 
 KEY_COLUMNS = ['lat', 'lng', 'floorNumber', 'roomsCount', 'ad_deal_type']
@@ -170,6 +172,9 @@ def clean_dataset(deal_type):
     search_clean = get_property_id(search_clean)
     search_clean.to_csv(f"csv/prepared_data/search_clean/{deal_type}.csv", index = False)
 
+    time_print("updating last_seen summary")
+    update_last_seen_summary(search_clean, deal_type)
+
     del search_clean
 
     time_print("turning creationDate to dttm")
@@ -305,6 +310,7 @@ def clean_dataset(deal_type):
 
 
     clean_df[cols_order].to_csv(f"csv/prepared_data/offers_parsed/{deal_type}_cleaned.csv", index = False)
+    write_month_partitions(clean_df[cols_order], deal_type)
 
 def cleaning_routine():
     deal_types = ['sale_secondary', 'short_rent', 'long_rent', 'sale_primary']
@@ -0,0 +1,128 @@
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+LAST_SEEN_DIR = "csv/prepared_data/last_seen"
+SEARCH_CLEAN_DIR = "csv/prepared_data/search_clean"
+SUMMARY_COLS = ['property_id', 'first_seen', 'last_seen', 'seen_count']
+# a search_clean row is one sighting of an ad url at a last_seen_dttm
+ROW_KEY_COLS = ['url', 'last_seen_dttm']
+
+
+def last_seen_path(deal_type, summary_dir=LAST_SEEN_DIR) -> pathlib.Path:
+    return pathlib.Path(summary_dir) / f"{deal_type}.csv"
+
+
+def seen_rows_path(deal_type, summary_dir=LAST_SEEN_DIR) -> pathlib.Path:
+    """Sorted uint64 hashes of the search_clean rows already merged into the summary."""
+    return pathlib.Path(summary_dir) / f"{deal_type}_seen_rows.npy"
+
+
+def _row_keys(df) -> np.ndarray:
+    return pd.util.hash_pandas_object(df[ROW_KEY_COLS], index=False).to_numpy()
+
+
+def _save_keys(path: pathlib.Path, keys: np.ndarray):
+    with path.open("wb") as f:  # np.save would append .npy to the tmp name
+        np.save(f, keys)
+
+
+def _replace(path: pathlib.Path, write_fn):
+    tmp = path.with_name(path.name + ".tmp")
+    write_fn(tmp)
+    tmp.replace(path)
+
+
+def load_last_seen_summary(deal_type, summary_dir=LAST_SEEN_DIR) -> pd.DataFrame:
+    """
+    Per-property summary of search_clean: first_seen, last_seen, seen_count (search_clean rows merged in).
+    """
+    path = last_seen_path(deal_type, summary_dir)
+    if not path.exists():
+        return pd.DataFrame(columns=SUMMARY_COLS)
+
+    summary_df = pd.read_csv(path, dtype={'property_id': str})
+    summary_df['first_seen'] = pd.to_datetime(summary_df['first_seen'])
+    summary_df['last_seen'] = pd.to_datetime(summary_df['last_seen'])
+    return summary_df
+
+
+def update_last_seen_summary(search_clean, deal_type, summary_dir=LAST_SEEN_DIR, rebuild=False) -> pd.DataFrame:
+    """
+    Merges the search_clean rows not merged before into the summary: rows are keyed by
+    (url, last_seen_dttm) hashes kept next to it, so any batch can be passed (the full table,
+    a trimmed one, late rows) and every row is counted once. Per property: first_seen / last_seen
+    are min / max, seen_count is summed over the new rows only.
+    rebuild=True drops the stored summary and keys and starts from search_clean.
+    A summary without its keys file can't tell old rows from new ones, so it is rebuilt too.
+    Returns the updated summary.
+    """
+    if not rebuild and not seen_rows_path(deal_type, summary_dir).exists():
+        if last_seen_path(deal_type, summary_dir).exists():
+            print(f"last_seen summary '{deal_type}' has no row keys, rebuilding it from search_clean")
+        rebuild = True
+
+    if rebuild:
+        summary_df, seen_keys = pd.DataFrame(columns=SUMMARY_COLS), np.array([], dtype=np.uint64)
+    else:
+        summary_df = load_last_seen_summary(deal_type, summary_dir)
+        seen_keys = np.load(seen_rows_path(deal_type, summary_dir))
+
+    new_df = search_clean.loc[search_clean['ad_deal_type'] == deal_type, ['property_id'] + ROW_KEY_COLS].copy()
+    new_df['last_seen_dttm'] = pd.to_datetime(new_df['last_seen_dttm'], errors='coerce')
+    new_df = new_df.dropna(subset=['property_id', 'last_seen_dttm'])
+    new_df['property_id'] = new_df['property_id'].astype(str)  # as read back from the summary csv
+
+    new_df['row_key'] = _row_keys(new_df)
+    new_df = new_df.drop_duplicates(subset='row_key')
+    new_df = new_df[~np.isin(new_df['row_key'].to_numpy(), seen_keys, assume_unique=True)]
+
+    print(f"last_seen summary '{deal_type}': {len(new_df)} new search_clean rows")
+    if len(new_df) == 0 and not rebuild:
+        return summary_df
+
+    new_summary_df = (
+        new_df
+        .groupby('property_id')
+        .agg(first_seen=('last_seen_dttm', 'min'), last_seen=('last_seen_dttm', 'max'), seen_count=('last_seen_dttm', 'size'))
+        .reset_index()
+    )
+
+    if len(summary_df) == 0:
+        summary_df = new_summary_df
+    else:
+        summary_df = (
+            pd.concat([summary_df, new_summary_df], ignore_index=True)
+            .groupby('property_id')
+            .agg(first_seen=('first_seen', 'min'), last_seen=('last_seen', 'max'), seen_count=('seen_count', 'sum'))
+            .reset_index()
+        )
+
+    path = last_seen_path(deal_type, summary_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    all_keys = np.union1d(seen_keys, new_df['row_key'].to_numpy())
+    _replace(path, lambda tmp: summary_df[SUMMARY_COLS].to_csv(tmp, index=False))
+    _replace(seen_rows_path(deal_type, summary_dir), lambda tmp: _save_keys(tmp, all_keys))
+
+    return summary_df
+
+
+def ensure_last_seen_summary(deal_type, summary_dir=LAST_SEEN_DIR, search_clean_dir=SEARCH_CLEAN_DIR):
+    """
+    Builds the summary from the saved search_clean csv if it or its row keys are missing (fresh checkout,
+    clean_dataset ran before the summary existed, or a summary written without row keys).
+    """
+    if last_seen_path(deal_type, summary_dir).exists() and seen_rows_path(deal_type, summary_dir).exists():
+        return
+
+    search_clean_path = pathlib.Path(search_clean_dir) / f"{deal_type}.csv"
+    if not search_clean_path.exists():
+        raise FileNotFoundError(
+            f"no last_seen summary for '{deal_type}' and no {search_clean_path} to build it from, run clean_dataset first"
+        )
+
+    print(f"last_seen summary '{deal_type}' is missing, building it from {search_clean_path}")
+    search_clean = pd.read_csv(search_clean_path, usecols=['ad_deal_type', 'property_id'] + ROW_KEY_COLS,
+                               dtype={'property_id': str})
+    update_last_seen_summary(search_clean, deal_type, summary_dir, rebuild=True)
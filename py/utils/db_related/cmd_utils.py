@@ -16,7 +16,7 @@ def rm_db():
 def delete_db():
     run_cmd("rm -rf db")
 
-def run_sh(path):
-    result = subprocess.run(["bash", path], capture_output=True, text=True)
+def run_sh(path, *args):
+    result = subprocess.run(["bash", path, *args], capture_output=True, text=True)
     print("STDOUT:", result.stdout)
     print("STDERR:", result.stderr)
\ No newline at end of file
@@ -0,0 +1,20 @@
+from hashlib import md5, sha256
+
+READ_CHUNK = 4 * 1024 * 1024  # 4 MiB
+
+
+def file_sha256(path):
+    h = sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_md5(path):
+    # Yandex Disk reports md5 for stored files
+    h = md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -0,0 +1,64 @@
+import pathlib
+import shutil
+
+import pandas as pd
+
+CLEANED_PARTITIONS_ROOT = "csv/prepared_data/offers_parsed/by_month"
+PARTITION_DATE_COL = "first_creation_date"
+NO_DATE_PARTITION = "no_date"
+
+
+def write_month_partitions(df, name, date_col=PARTITION_DATE_COL, root=CLEANED_PARTITIONS_ROOT):
+    """
+    {root}/{name}/{YYYY-MM}.csv, one file per month of date_col (rows without a date go to no_date.csv).
+    The previous partitions of name are replaced as a whole.
+    """
+    out_dir = pathlib.Path(root) / name
+    tmp_dir = out_dir.with_name(f"{name}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    months = pd.to_datetime(df[date_col], format='ISO8601').dt.strftime('%Y-%m').fillna(NO_DATE_PARTITION)
+    for month, part_df in df.groupby(months, sort=True):
+        part_df.to_csv(tmp_dir / f"{month}.csv", index=False)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    tmp_dir.rename(out_dir)
+
+
+def read_date_window(
+    name,
+    start_dt,
+    end_dt,
+    columns=None,
+    date_col=PARTITION_DATE_COL,
+    root=CLEANED_PARTITIONS_ROOT,
+    fallback_path=None,
+) -> pd.DataFrame:
+    """
+    Rows with start_dt <= date_col <= end_dt, only the requested columns parsed.
+      - month partitions outside the window are not opened
+      - columns are pushed down to the csv parser (names missing in the file are ignored)
+    Reads fallback_path whole (still with column pushdown) if name was never partitioned.
+    """
+    start_dt, end_dt = pd.to_datetime(start_dt), pd.to_datetime(end_dt)
+    usecols = None if columns is None else (lambda col, keep=set(columns) | {date_col}: col in keep)
+
+    part_dir = pathlib.Path(root) / name
+    if part_dir.is_dir():
+        months = pd.period_range(start_dt, end_dt, freq='M').strftime('%Y-%m')
+        paths = [part_dir / f"{month}.csv" for month in months if (part_dir / f"{month}.csv").exists()]
+    elif fallback_path is not None:
+        paths = [pathlib.Path(fallback_path)]
+    else:
+        raise FileNotFoundError(f"no partitions for '{name}' in {root} and no fallback_path")
+
+    if paths:
+        df = pd.concat([pd.read_csv(path, usecols=usecols) for path in paths], ignore_index=True)
+    else:
+        # nothing in the window: header of any partition, so the caller still gets the columns
+        any_path = next(part_dir.glob("*.csv"), None)
+        df = pd.read_csv(any_path, usecols=usecols, nrows=0) if any_path else pd.DataFrame(columns=[date_col])
+
+    dates = pd.to_datetime(df[date_col], format='ISO8601')
+    return df[(dates >= start_dt) & (dates <= end_dt)].reset_index(drop=True)
@@ -0,0 +1,34 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+
+
+def within_region_mask(geoms, region) -> np.ndarray:
+    """
+    Boolean mask: geoms[i].within(region), for any region boundary (MKAD, city, oblast...).
+      - region is prepared once
+      - STRtree over geoms discards everything whose bbox is outside the region's bbox
+      - the exact test runs as one bulk predicate query on the remaining candidates
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    mask = np.zeros(len(geoms), dtype=bool)
+    if len(geoms) == 0 or region is None or region.is_empty:
+        return mask
+
+    shapely.prepare(region)
+    tree = shapely.STRtree(geoms)
+
+    # tree query predicate is evaluated as predicate(region, tree_geom),
+    # and region.contains(g) == g.within(region)
+    mask[tree.query(region, predicate="contains")] = True
+    return mask
+
+
+def clip_within_region(gdf: gpd.GeoDataFrame, region, region_crs="EPSG:4326") -> gpd.GeoDataFrame:
+    """
+    Keep only rows of gdf strictly within region (a shapely geometry in region_crs).
+    """
+    gdf = gdf.to_crs(region_crs) if gdf.crs else gdf.set_crs(region_crs)
+
+    mask = within_region_mask(gdf.geometry.to_numpy(), region)
+    return gdf[mask].copy()
@@ -1,20 +1,42 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
 import pandas as pd
 import geopandas as gpd
-from sklearn.neighbors import BallTree
 
+import shapely
 from pyproj import Transformer
-from shapely.ops import nearest_points
+
+from py.utils.general.file_hash import file_sha256
+from py.utils.geo.geo_features_cache import GEO_CACHE_DIR, get_cached_features, load_cached, save_cached
+from py.utils.geo.spatial_backends import (
+    SPATIAL_BACKEND,
+    SPATIAL_METRIC_EPSG,
+    build_spatial_index,
+    count_within,
+    query_nearest,
+)
+from py.utils.geo.walk_network import WALK_GRAPH_PATH, add_walk_distance_to_stations, load_walk_graph
 
 EARTH_R = 6_371_000.0
+MOSCOW_CENTER = (55.75578, 37.61786)  # Moscow "0 km", (lat, lng)
 
 OSM_GPKG_PATH = "moscow_features_within_mkad.gpkg"
 OSM_GPKG_LAYER = "features"   # change if your layer name differs
 OSM_LABELS = ['energy', 'waste', 'industrial_area', 'water', 'green']
 
+COUNT_THRESHOLDS = {0: "0m", 100: "100m", 500: "500m", 1000: "1km", 5000: "5km"}
+
+OSM_CHUNK_SIZE = 20_000  # properties per (label, chunk) task in parallel mode
+
 # Metric CRS for Moscow to compute distances in meters
 OSM_METRIC_EPSG = 32637  # UTM 37N
 
+CLEANED_OFFERS_PATH = "csv/prepared_data/offers_parsed/all_deal_types_cleaned.csv"
+STATIONS_PATH = "xlsx/geo/processed/stations.xlsx"
+COORDS_COLS = ['ad_deal_type', 'property_id', 'lng', 'lat']
+
 
 def fix_lat_lng(df, lat_col="lat", lng_col="lng"):
     swap = df[lat_col] <= df[lng_col]
@@ -27,7 +49,7 @@ def get_radians(df, lat_col, lng_col):
 
 def add_distance_to_center(properties_coords_df):
     properties_radian = get_radians(properties_coords_df, 'lat', 'lng')
-    lat0, lon0 = np.deg2rad([55.75578, 37.61786])  # Moscow "0 km"
+    lat0, lon0 = np.deg2rad(MOSCOW_CENTER)
 
     dlat = properties_radian[:, 0] - lat0
     dlon = properties_radian[:, 1] - lon0
@@ -36,57 +58,50 @@ def add_distance_to_center(properties_coords_df):
     properties_coords_df['distance_to_center_meters'] = (EARTH_R * c).astype(np.float64)
 
 
-def get_objects_count_within_thresholds(properties_coords_df, properties_radian, objects_ball_tree, suffix):
-    thresholds_dict = {0: "0m", 100: "100m", 500: "500m", 1000: "1km", 5000: "5km"}
-
-    thresholds_m = np.array(list(thresholds_dict.keys()), dtype=np.float64)
-    thresholds_rad = thresholds_m / EARTH_R
+def get_objects_count_within_thresholds(properties_coords_df, spatial_index, suffix, n_jobs=1):
+    thresholds_m = np.array(list(COUNT_THRESHOLDS.keys()), dtype=np.float64)
 
-    _, dists = objects_ball_tree.query_radius(
-        properties_radian,
-        r=thresholds_rad[-1],
-        return_distance=True,
-        sort_results=True
+    counts = count_within(
+        spatial_index, properties_coords_df['lat'], properties_coords_df['lng'], thresholds_m, n_jobs=n_jobs
     )
 
-    counts = np.zeros((len(properties_radian), len(thresholds_dict)), dtype=int)
-    for i, di in enumerate(dists):
-        counts[i] = np.searchsorted(di, thresholds_rad, side='right')
-
-    for i, key_value in enumerate(thresholds_dict.items()):
+    for i, key_value in enumerate(COUNT_THRESHOLDS.items()):
         properties_coords_df[f'{suffix}_within{key_value[1]}'] = counts[:, i]
 
 
-def get_closest_station_objects(properties_coords_df, objects_coords_df, suffix):
-    properties_radian = get_radians(properties_coords_df, 'lat', 'lng')
-    objects_radian = get_radians(objects_coords_df, 'lat', 'lon')
+def get_closest_station_objects(properties_coords_df, objects_coords_df, suffix, spatial_index=None, backend=SPATIAL_BACKEND):
+    if spatial_index is None:
+        spatial_index = build_spatial_index(objects_coords_df['lat'], objects_coords_df['lon'], backend=backend)
 
-    ball_tree = BallTree(objects_radian, metric='haversine')
-
-    dist_rad, ind = ball_tree.query(properties_radian, k=1, return_distance=True)
+    dist_m, ind = query_nearest(spatial_index, properties_coords_df['lat'], properties_coords_df['lng'])
 
     def extract_neighbor(col_name):
-        return objects_coords_df[col_name].to_numpy()[ind[:, 0]]
+        return objects_coords_df[col_name].to_numpy()[ind]
 
     properties_coords_df[f'nearest_{suffix}'] = extract_neighbor('station_name')
     properties_coords_df[f'nearest_{suffix}_line'] = extract_neighbor('line')
     properties_coords_df[f'nearest_{suffix}_lat'] = extract_neighbor('lat')
     properties_coords_df[f'nearest_{suffix}_lng'] = extract_neighbor('lon')
-    properties_coords_df[f'nearest_{suffix}_distance_meters'] = (dist_rad[:, 0] * EARTH_R).astype(np.float64)
+    properties_coords_df[f'nearest_{suffix}_distance_meters'] = dist_m
 
-    get_objects_count_within_thresholds(properties_coords_df, properties_radian, ball_tree, suffix)
+    get_objects_count_within_thresholds(properties_coords_df, spatial_index, suffix)
 
 
-def get_closest_ads_count(properties_coords_df, ads_coords_df):
-    properties_radian = get_radians(properties_coords_df, 'lat', 'lng')
+def get_closest_ads_count(properties_coords_df, ads_coords_df, n_jobs=1, backend=SPATIAL_BACKEND):
+    # one coords array sorted by deal type, each deal type is a contiguous slice of it
+    # (count-only queries can't split a shared tree by label, so trees are built on views, no df copies)
+    labels = ads_coords_df['ad_deal_type'].astype(str).to_numpy()
+    order = np.argsort(labels, kind='stable')
+    ads_lat = ads_coords_df['lat'].to_numpy(dtype=np.float64)[order]
+    ads_lng = ads_coords_df['lng'].to_numpy(dtype=np.float64)[order]
+    deal_types, starts, sizes = np.unique(labels[order], return_index=True, return_counts=True)
+    slices = dict(zip(deal_types, zip(starts, sizes)))
 
-    deal_types = ads_coords_df['ad_deal_type'].unique().tolist()
-    for single_deal_type in deal_types:
-        filtered_ads_coords_df = ads_coords_df.query("ad_deal_type == @single_deal_type").copy()
-        objects_radian = get_radians(filtered_ads_coords_df, 'lat', 'lng')
-        ball_tree = BallTree(objects_radian, metric='haversine')
-
-        get_objects_count_within_thresholds(properties_coords_df, properties_radian, ball_tree, single_deal_type)
+    # keep first-appearance order of deal types for the output columns
+    for single_deal_type in pd.unique(labels):
+        start, size = slices[single_deal_type]
+        spatial_index = build_spatial_index(ads_lat[start:start + size], ads_lng[start:start + size], backend=backend)
+        get_objects_count_within_thresholds(properties_coords_df, spatial_index, single_deal_type, n_jobs=n_jobs)
 
 
 # -------------------- FIXED: OSM closest features (distance to EDGE) --------------------
@@ -95,15 +110,17 @@ def load_osm_features_edges_gdf(
     gpkg_path=OSM_GPKG_PATH,
     layer=OSM_GPKG_LAYER,
     metric_epsg: int = OSM_METRIC_EPSG,
+    bbox: tuple | None = None,
 ) -> gpd.GeoDataFrame:
     """
     Read OSM features and build an "edge geometry" GeoDataFrame in METERS:
       - Polygons/MultiPolygons -> boundary (edge)
       - Lines/MultiLines -> unchanged (edge is the line itself)
       - Points -> unchanged
+    bbox (minx, miny, maxx, maxy in the layer CRS) reads only intersecting features.
     Returns GeoDataFrame with columns: ['label', 'edge'] in EPSG:metric_epsg
     """
-    gdf = gpd.read_file(gpkg_path, layer=layer)
+    gdf = gpd.read_file(gpkg_path, layer=layer, bbox=bbox)
 
     if "label" not in gdf.columns:
         raise ValueError("OSM gpkg must contain a 'label' column.")
@@ -132,35 +149,148 @@ def load_osm_features_edges_gdf(
     return out
 
 
-def _extract_endpoints_wgs_from_shortest_lines(lines_m: gpd.GeoSeries, metric_epsg: int) -> tuple[np.ndarray, np.ndarray]:
+def build_osm_edges_index(osm_edges_gdf: gpd.GeoDataFrame, labels=OSM_LABELS) -> dict:
+    """
+    {label: (edge geometries array, STRtree over them)}, labels without edges are skipped.
+    """
+    edges_index = {}
+    for lab in labels:
+        edges = osm_edges_gdf.geometry[osm_edges_gdf["label"] == lab].to_numpy()
+        if len(edges) > 0:
+            edges_index[lab] = (edges, shapely.STRtree(edges))
+    return edges_index
+
+
+def load_osm_edges_index(
+    gpkg_path=OSM_GPKG_PATH,
+    layer=OSM_GPKG_LAYER,
+    metric_epsg: int = OSM_METRIC_EPSG,
+    labels=OSM_LABELS,
+    cache_dir=GEO_CACHE_DIR,
+) -> dict:
+    """
+    build_osm_edges_index over load_osm_features_edges_gdf, serialized on disk
+    and keyed by the gpkg hash + layer + CRS, so reading/reprojecting/boundaries
+    are only redone when the source changes.
+    """
+    fingerprint = f"{file_sha256(gpkg_path)}_{layer}_{metric_epsg}_{list(labels)}"
+
+    edges_index = load_cached("osm_edges_index", fingerprint, cache_dir)
+    if edges_index is None:
+        osm_edges_gdf = load_osm_features_edges_gdf(gpkg_path, layer=layer, metric_epsg=metric_epsg)
+        edges_index = build_osm_edges_index(osm_edges_gdf, labels)
+        save_cached("osm_edges_index", fingerprint, edges_index, cache_dir)
+
+    return edges_index
+
+
+def load_stations_index(stations_path=STATIONS_PATH, cache_dir=GEO_CACHE_DIR, backend=SPATIAL_BACKEND) -> dict:
+    """
+    {station_type: (stations_df, spatial index)}, serialized on disk and keyed by the stations file hash + backend.
+    """
+    fingerprint = f"{file_sha256(stations_path)}_{backend}_{SPATIAL_METRIC_EPSG}"
+
+    stations_index = load_cached(f"stations_index_{backend}", fingerprint, cache_dir)
+    if stations_index is None:
+        stations_df = pd.read_excel(stations_path)
+        fix_lat_lng(stations_df, "lat", "lon")
+
+        stations_index = {}
+        for station_type in ['subway', 'mcd']:
+            type_df = stations_df.query("station_type == @station_type").reset_index(drop=True)
+            stations_index[station_type] = (type_df, build_spatial_index(type_df['lat'], type_df['lon'], backend=backend))
+
+        save_cached(f"stations_index_{backend}", fingerprint, stations_index, cache_dir)
+
+    return stations_index
+
+
+def _extract_endpoints_wgs_from_shortest_lines(lines_m, metric_epsg: int) -> tuple[np.ndarray, np.ndarray]:
     """
     Given shortest lines (point->edge) in meters, return endpoint (on edge) as lat/lng arrays in WGS84.
+    Array-level: endpoints via shapely 2 ufuncs, one batched pyproj transform.
     """
     to_wgs = Transformer.from_crs(f"EPSG:{metric_epsg}", "EPSG:4326", always_xy=True)
 
-    lat = np.full(len(lines_m), np.nan, dtype=np.float64)
-    lng = np.full(len(lines_m), np.nan, dtype=np.float64)
+    lines = np.asarray(lines_m, dtype=object)
+    lat = np.full(len(lines), np.nan, dtype=np.float64)
+    lng = np.full(len(lines), np.nan, dtype=np.float64)
+
+    valid = ~shapely.is_missing(lines) & ~shapely.is_empty(lines)
+    valid[valid] = shapely.get_num_points(lines[valid]) >= 2
+    if not valid.any():
+        return lat, lng
 
-    for i, ln in enumerate(lines_m):
-        if ln is None or ln.is_empty:
-            continue
-        coords = list(ln.coords)
-        if len(coords) < 2:
-            continue
-        x, y = coords[-1]  # line ends at nearest point on "other" geometry
-        lon, la = to_wgs.transform(x, y)
-        lat[i] = la
-        lng[i] = lon
+    # line ends at nearest point on "other" geometry
+    xy = shapely.get_coordinates(shapely.get_point(lines[valid], -1))
+    lon_sel, lat_sel = to_wgs.transform(xy[:, 0], xy[:, 1])
+    lat[valid] = lat_sel
+    lng[valid] = lon_sel
 
     return lat, lng
 
 
+def _nearest_edge_features(points_m, edges_m, edges_tree, metric_epsg, max_distance_m=None):
+    """
+    Nearest edge for each point (all in meters): distance and the nearest point on edge in WGS84.
+    Returns (dist, lat, lng) arrays aligned with points_m, NaN where nothing was found.
+    """
+    n = len(points_m)
+    out_dist = np.full(n, np.nan, dtype=np.float64)
+    out_lat = np.full(n, np.nan, dtype=np.float64)
+    out_lng = np.full(n, np.nan, dtype=np.float64)
+
+    # nearest geometry in the tree for each input point
+    idx, dist = edges_tree.query_nearest(
+        points_m,
+        return_distance=True,
+        all_matches=False,
+        max_distance=max_distance_m,
+    )
+    left_ix = np.asarray(idx[0], dtype=int)
+    right_pos = np.asarray(idx[1], dtype=int)
+
+    # distances are in meters (projected CRS)
+    out_dist[left_ix] = np.asarray(dist, dtype=np.float64)
+
+    # shortest line between point and edge; endpoint is nearest point on edge
+    lines = shapely.shortest_line(points_m[left_ix], edges_m[right_pos])
+    out_lat[left_ix], out_lng[left_ix] = _extract_endpoints_wgs_from_shortest_lines(lines, metric_epsg)
+
+    return out_dist, out_lat, out_lng
+
+
+# per-process state of the OSM worker pool: edge geometries are shipped once per worker
+_OSM_WORKER_EDGES = {}
+_OSM_WORKER_TREES = {}
+
+
+def _init_osm_worker(edges_by_label):
+    global _OSM_WORKER_EDGES, _OSM_WORKER_TREES
+    _OSM_WORKER_EDGES = edges_by_label
+    _OSM_WORKER_TREES = {}
+
+
+def _osm_worker_task(label, start, points_xy, metric_epsg, max_distance_m):
+    if label not in _OSM_WORKER_TREES:
+        _OSM_WORKER_TREES[label] = shapely.STRtree(_OSM_WORKER_EDGES[label])
+
+    points_m = shapely.points(points_xy)
+    result = _nearest_edge_features(
+        points_m, _OSM_WORKER_EDGES[label], _OSM_WORKER_TREES[label], metric_epsg, max_distance_m
+    )
+    return label, start, result
+
+
 def add_closest_osm_features(
     properties_coords_df: pd.DataFrame,
-    osm_edges_gdf: gpd.GeoDataFrame,
+    osm_edges_gdf: gpd.GeoDataFrame | None,
     labels=OSM_LABELS,
     metric_epsg: int = OSM_METRIC_EPSG,
     max_distance_m: float | None = None,  # set e.g. 50000 to limit search radius
+    n_jobs: int = 1,
+    chunk_size: int = OSM_CHUNK_SIZE,
+    edges_index: dict | None = None,
 ):
     """
     Adds ONLY nearest-edge features for each OSM label:
@@ -169,90 +299,154 @@ def add_closest_osm_features(
       - closest_<label>_lng
 
     No within{...} counters for OSM features.
+    With n_jobs > 1, (label, point chunk) tasks run on a process pool.
+    A prebuilt edges_index (see load_osm_edges_index) can be passed instead of osm_edges_gdf.
     """
     # property points in meters (same order as properties_coords_df)
     props_geom_wgs = gpd.GeoSeries(
         gpd.points_from_xy(properties_coords_df["lng"], properties_coords_df["lat"], crs="EPSG:4326")
     )
-    props_geom_m = props_geom_wgs.to_crs(epsg=metric_epsg)
+    props_geom_m = props_geom_wgs.to_crs(epsg=metric_epsg).to_numpy()
 
     n = len(properties_coords_df)
+    if edges_index is None:
+        edges_index = build_osm_edges_index(osm_edges_gdf, labels)
+
+    results = {
+        lab: tuple(np.full(n, np.nan, dtype=np.float64) for _ in range(3))
+        for lab in labels
+    }
+    labels_to_do = [lab for lab in labels if lab in edges_index]
+
+    if n_jobs == 1:
+        for lab in labels_to_do:
+            edges, edges_tree = edges_index[lab]
+            results[lab] = _nearest_edge_features(props_geom_m, edges, edges_tree, metric_epsg, max_distance_m)
+    else:
+        props_xy = shapely.get_coordinates(props_geom_m)
+        with ProcessPoolExecutor(
+            max_workers=None if n_jobs == -1 else n_jobs,
+            initializer=_init_osm_worker,
+            initargs=({lab: edges_index[lab][0] for lab in labels_to_do},),
+        ) as pool:
+            futures = [
+                pool.submit(_osm_worker_task, lab, start, props_xy[start:start + chunk_size],
+                            metric_epsg, max_distance_m)
+                for lab in labels_to_do
+                for start in range(0, n, chunk_size)
+            ]
+            # merge back in property order
+            for fut in as_completed(futures):
+                lab, start, chunk_result = fut.result()
+                for out, part in zip(results[lab], chunk_result):
+                    out[start:start + len(part)] = part
 
     for lab in labels:
         suffix = f"closest_{lab}"
+        out_dist, out_lat, out_lng = results[lab]
 
-        edges_sub = osm_edges_gdf[osm_edges_gdf["label"] == lab]
-        if edges_sub.empty:
-            properties_coords_df[f"{suffix}_distance_meters"] = np.nan
-            properties_coords_df[f"{suffix}_lat"] = np.nan
-            properties_coords_df[f"{suffix}_lng"] = np.nan
-            continue
-
-        # nearest geometry in the tree for each input point
-        idx, dist = edges_sub.sindex.nearest(
-            props_geom_m,
-            return_all=False,
-            return_distance=True,
-            max_distance=max_distance_m,
-        )
+        properties_coords_df[f"{suffix}_distance_meters"] = out_dist
+        properties_coords_df[f"{suffix}_lat"] = out_lat
+        properties_coords_df[f"{suffix}_lng"] = out_lng
+
+
+def load_coords_dfs(path=CLEANED_OFFERS_PATH):
+    """
+    Single pass over the cleaned offers: parse only the coordinate columns
+    (skips description/price_history text) and derive both frames from it.
+    Returns (properties_coords_df, ads_coords_df).
+    """
+    ads_coords_df = pd.read_csv(
+        path,
+        usecols=COORDS_COLS,
+        dtype={'ad_deal_type': 'category', 'property_id': str, 'lng': np.float64, 'lat': np.float64},
+    )
+    fix_lat_lng(ads_coords_df, "lat", "lng")
 
-        out_dist = np.full(n, np.nan, dtype=np.float64)
-        out_lat = np.full(n, np.nan, dtype=np.float64)
-        out_lng = np.full(n, np.nan, dtype=np.float64)
+    ads_coords_df = ads_coords_df[COORDS_COLS].drop_duplicates()
+    properties_coords_df = ads_coords_df[['lng', 'lat']].drop_duplicates()
 
-        left_ix = np.asarray(idx[0], dtype=int)
-        right_pos = np.asarray(idx[1], dtype=int)
+    return properties_coords_df, ads_coords_df
 
-        # distances are in meters (projected CRS)
-        out_dist[left_ix] = np.asarray(dist, dtype=np.float64)
 
-        # get nearest point on edge for matched pairs
-        pts_sel = gpd.GeoSeries(props_geom_m.iloc[left_ix].to_numpy(), crs=f"EPSG:{metric_epsg}")
-        edges_sel = gpd.GeoSeries(edges_sub.geometry.iloc[right_pos].to_numpy(), crs=f"EPSG:{metric_epsg}")
+def _add_station_features(properties_coords_df, stations_path=STATIONS_PATH, backend=SPATIAL_BACKEND):
+    stations_index = load_stations_index(stations_path, backend=backend)
 
-        if hasattr(gpd.GeoSeries, "shortest_line"):
-            # Fast path: shortest line between point and edge; endpoint is nearest point on edge
-            lines = pts_sel.shortest_line(edges_sel)
-            lat_sel, lng_sel = _extract_endpoints_wgs_from_shortest_lines(lines, metric_epsg)
-            out_lat[left_ix] = lat_sel
-            out_lng[left_ix] = lng_sel
-        else:
-            # Fallback: per-row nearest_points (slower, but works everywhere)
-            to_wgs = Transformer.from_crs(f"EPSG:{metric_epsg}", "EPSG:4326", always_xy=True)
-            for k in range(len(left_ix)):
-                li = left_ix[k]
-                p = pts_sel.iloc[k]
-                e = edges_sel.iloc[k]
-                if p is None or p.is_empty or e is None or e.is_empty:
-                    continue
-                _, p_edge = nearest_points(p, e)
-                lon, la = to_wgs.transform(p_edge.x, p_edge.y)
-                out_lat[li] = la
-                out_lng[li] = lon
+    for suffix in ['subway', 'mcd']:
+        stations_df, spatial_index = stations_index[suffix]
+        get_closest_station_objects(properties_coords_df, stations_df, suffix=suffix, spatial_index=spatial_index)
 
-        properties_coords_df[f"{suffix}_distance_meters"] = out_dist
-        properties_coords_df[f"{suffix}_lat"] = out_lat
-        properties_coords_df[f"{suffix}_lng"] = out_lng
+
+def _add_osm_features(properties_coords_df, gpkg_path=OSM_GPKG_PATH, n_jobs=1):
+    # FIXED: closest OSM features (distance to nearest edge, not to center)
+    edges_index = load_osm_edges_index(gpkg_path, layer=OSM_GPKG_LAYER, metric_epsg=OSM_METRIC_EPSG, labels=OSM_LABELS)
+    add_closest_osm_features(properties_coords_df, None, labels=OSM_LABELS, metric_epsg=OSM_METRIC_EPSG,
+                             n_jobs=n_jobs, edges_index=edges_index)
+
+
+def _add_walk_features(properties_coords_df, stations_path=STATIONS_PATH, graph_path=WALK_GRAPH_PATH):
+    stations_df, _ = load_stations_index(stations_path)['subway']
+    add_walk_distance_to_stations(properties_coords_df, stations_df, suffix='subway', graph=load_walk_graph(graph_path))
 
 
 # -------------------- MAIN --------------------
-def get_geo_features_df():
-    properties_coords_df = pd.read_csv("csv/prepared_data/offers_parsed/all_deal_types_cleaned.csv")[['lng', 'lat']].drop_duplicates()
-    ads_coords_df = pd.read_csv("csv/prepared_data/offers_parsed/all_deal_types_cleaned.csv")[['ad_deal_type', 'property_id', 'lng', 'lat']].drop_duplicates()
-    stations_df = pd.read_excel("xlsx/geo/processed/stations.xlsx")
+def compute_geo_features(
+    properties_coords_df,
+    ads_coords_df,
+    use_cache=True,
+    cache_dir=GEO_CACHE_DIR,
+    n_jobs=1,
+    backend=SPATIAL_BACKEND,
+    stations_path=STATIONS_PATH,
+    gpkg_path=OSM_GPKG_PATH,
+    walk_graph_path=WALK_GRAPH_PATH,
+) -> pd.DataFrame:
+    """
+    backend: spatial backend for station and ads queries, see spatial_backends.SPATIAL_BACKENDS.
+    Static features (center, stations, walk, OSM) come from the per-coordinate cache
+    and are computed only for new coords; a group is recomputed from scratch when
+    its inputs (stations.xlsx, walk graph, OSM gpkg) change. Ads counts change daily and
+    are always recomputed.
+    Walking distance to the subway needs walk_graph_path (see walk_network.prepare_walk_graph)
+    and is skipped when the graph is missing.
+    """
+    static_groups = [
+        ("center", f"{MOSCOW_CENTER}", add_distance_to_center),
+        ("stations", f"{file_sha256(stations_path)}_{backend}",
+         lambda df: _add_station_features(df, stations_path=stations_path, backend=backend)),
+        ("osm", f"{file_sha256(gpkg_path)}_{OSM_GPKG_LAYER}_{OSM_LABELS}_{OSM_METRIC_EPSG}",
+         lambda df: _add_osm_features(df, gpkg_path=gpkg_path, n_jobs=n_jobs)),
+    ]
+    if os.path.exists(walk_graph_path):
+        static_groups.append(
+            ("walk", f"{file_sha256(stations_path)}_{file_sha256(walk_graph_path)}",
+             lambda df: _add_walk_features(df, stations_path=stations_path, graph_path=walk_graph_path))
+        )
+    else:
+        print(f"{walk_graph_path} not found, skipping walking distance features")
 
-    fix_lat_lng(properties_coords_df, "lat", "lng")
-    fix_lat_lng(ads_coords_df, "lat", "lng")
-    fix_lat_lng(stations_df, "lat", "lon")
+    static_features = {}
+    for group, fingerprint, compute_fn in static_groups:
+        if use_cache:
+            static_features[group] = get_cached_features(properties_coords_df, group, fingerprint, compute_fn, cache_dir)
+        else:
+            group_df = properties_coords_df[['lng', 'lat']].copy()
+            compute_fn(group_df)
+            static_features[group] = group_df.drop(columns=['lng', 'lat'])
 
-    add_distance_to_center(properties_coords_df)
-    get_closest_station_objects(properties_coords_df, stations_df.query("station_type == 'subway'"), suffix='subway')
-    get_closest_station_objects(properties_coords_df, stations_df.query("station_type == 'mcd'"), suffix='mcd')
-    get_closest_ads_count(properties_coords_df, ads_coords_df)
+    properties_coords_df = pd.concat(
+        [properties_coords_df, static_features["center"], static_features["stations"], static_features.get("walk")],
+        axis=1,
+    )
+    get_closest_ads_count(properties_coords_df, ads_coords_df, n_jobs=n_jobs, backend=backend)
+    return pd.concat([properties_coords_df, static_features["osm"]], axis=1)
 
-    # FIXED: closest OSM features (distance to nearest edge, not to center)
-    osm_edges_gdf = load_osm_features_edges_gdf(OSM_GPKG_PATH, layer=OSM_GPKG_LAYER, metric_epsg=OSM_METRIC_EPSG)
-    add_closest_osm_features(properties_coords_df, osm_edges_gdf, labels=OSM_LABELS, metric_epsg=OSM_METRIC_EPSG)
+
+def get_geo_features_df(use_cache=True, cache_dir=GEO_CACHE_DIR, n_jobs=1, backend=SPATIAL_BACKEND):
+    properties_coords_df, ads_coords_df = load_coords_dfs(CLEANED_OFFERS_PATH)
+    properties_coords_df = compute_geo_features(
+        properties_coords_df, ads_coords_df, use_cache=use_cache, cache_dir=cache_dir, n_jobs=n_jobs, backend=backend
+    )
 
     properties_coords_df = properties_coords_df.drop_duplicates().reset_index()
 
@@ -0,0 +1,70 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from py.utils.general.file_hash import file_sha256
+from py.utils.geo.geo_features_cache import GEO_CACHE_DIR, get_cached_features, load_cached, save_cached
+
+DISTRICTS_POLYGONS_PATH = "moscow_districts.gpkg"  # see py/geo/prepare_district_polygons.py
+DISTRICT_COLS = ['ao', 'district']
+
+
+def load_districts_index(path=DISTRICTS_POLYGONS_PATH, cache_dir=GEO_CACHE_DIR) -> tuple[pd.DataFrame, shapely.STRtree]:
+    """
+    (districts_df with DISTRICT_COLS, STRtree over the WGS84 district polygons in the same order),
+    serialized on disk and keyed by the polygons file hash.
+    """
+    fingerprint = file_sha256(path)
+
+    districts_index = load_cached("districts_index", fingerprint, cache_dir)
+    if districts_index is None:
+        gdf = gpd.read_file(path)
+        gdf = gdf.to_crs("EPSG:4326") if gdf.crs else gdf.set_crs("EPSG:4326")
+        gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty].reset_index(drop=True)
+
+        geoms = shapely.make_valid(gdf.geometry.to_numpy())
+        districts_index = (pd.DataFrame(gdf[DISTRICT_COLS]), shapely.STRtree(geoms))
+        save_cached("districts_index", fingerprint, districts_index, cache_dir)
+
+    return districts_index
+
+
+def assign_districts(properties_coords_df, districts_index):
+    """
+    Adds DISTRICT_COLS of the polygon containing each (lat, lng), NaN outside all polygons.
+    One bulk STRtree query for all points; on overlaps the first polygon wins.
+    """
+    districts_df, tree = districts_index
+
+    points = shapely.points(
+        properties_coords_df['lng'].to_numpy(dtype=np.float64),
+        properties_coords_df['lat'].to_numpy(dtype=np.float64),
+    )
+    point_idx, poly_idx = tree.query(points, predicate="within")
+
+    point_idx, first = np.unique(point_idx, return_index=True)
+    poly_idx = poly_idx[first]
+
+    for col in DISTRICT_COLS:
+        values = np.full(len(points), None, dtype=object)
+        values[point_idx] = districts_df[col].to_numpy()[poly_idx]
+        properties_coords_df[col] = values
+
+
+def get_district_features(coords_df, path=DISTRICTS_POLYGONS_PATH, cache_dir=GEO_CACHE_DIR) -> pd.DataFrame:
+    """
+    ['lng', 'lat'] + DISTRICT_COLS for unique coords; assignments are cached per coordinate
+    and recomputed only for new coords or when the polygons file changes.
+    """
+    coords_df = coords_df[['lng', 'lat']].drop_duplicates()
+
+    districts_features = get_cached_features(
+        coords_df,
+        "districts",
+        file_sha256(path),
+        lambda df: assign_districts(df, load_districts_index(path, cache_dir)),
+        cache_dir,
+    )
+
+    return pd.concat([coords_df, districts_features], axis=1)
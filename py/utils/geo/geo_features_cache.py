@@ -0,0 +1,78 @@
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+GEO_CACHE_DIR = "cache/geo"
+
+# coords are quantized to 1e-6 deg (~0.1 m) before keying
+COORD_QUANT = 1_000_000
+LNG_OFFSET = 200_000_000  # keeps quantized lng non-negative
+
+
+def coords_key(df, lat_col="lat", lng_col="lng") -> np.ndarray:
+    """
+    int64 key per row from quantized (lat, lng).
+    """
+    lat_q = np.rint(df[lat_col].to_numpy(dtype=np.float64) * COORD_QUANT).astype(np.int64)
+    lng_q = np.rint(df[lng_col].to_numpy(dtype=np.float64) * COORD_QUANT).astype(np.int64)
+    return lat_q * 1_000_000_000 + (lng_q + LNG_OFFSET)
+
+
+def _cache_path(cache_dir, name) -> pathlib.Path:
+    return pathlib.Path(cache_dir) / f"{name}.pkl"
+
+
+def load_cached(name, fingerprint, cache_dir=GEO_CACHE_DIR):
+    """
+    Cached payload (feature frame, prepared geometries, built trees...) or None if missing
+    or computed from other inputs (fingerprint mismatch).
+    """
+    path = _cache_path(cache_dir, name)
+    if not path.exists():
+        return None
+
+    stored = pd.read_pickle(path)
+    if stored["fingerprint"] != fingerprint:
+        print(f"geo cache '{name}': inputs changed, invalidating")
+        return None
+
+    return stored["payload"]
+
+
+def save_cached(name, fingerprint, payload, cache_dir=GEO_CACHE_DIR):
+    path = _cache_path(cache_dir, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = path.with_suffix(".tmp")
+    pd.to_pickle({"fingerprint": fingerprint, "payload": payload}, tmp)
+    tmp.replace(path)
+
+
+def get_cached_features(properties_coords_df, group, fingerprint, compute_fn, cache_dir=GEO_CACHE_DIR) -> pd.DataFrame:
+    """
+    Feature columns of a group aligned with properties_coords_df.
+    compute_fn(df) adds the group's columns to a ['lng', 'lat'] frame in place
+    (same contract as add_distance_to_center & co.); it only runs on coords
+    that are not cached yet.
+    """
+    keys = coords_key(properties_coords_df)
+    cached = load_cached(group, fingerprint, cache_dir)
+
+    missing = np.ones(len(keys), dtype=bool) if cached is None else ~np.isin(keys, cached.index.to_numpy())
+    print(f"geo cache '{group}': {int(missing.sum())} new coords out of {len(keys)}")
+
+    if missing.any():
+        new_df = properties_coords_df.loc[missing, ['lng', 'lat']].copy()
+        compute_fn(new_df)
+
+        new_features = new_df.drop(columns=['lng', 'lat'])
+        new_features.index = keys[missing]
+
+        cached = new_features if cached is None else pd.concat([cached, new_features])
+        cached = cached[~cached.index.duplicated(keep="last")]
+        save_cached(group, fingerprint, cached, cache_dir)
+
+    out = cached.reindex(keys)
+    out.index = properties_coords_df.index
+    return out
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from py.utils.geo.coords_features_gen import CLEANED_OFFERS_PATH, fix_lat_lng
+from py.utils.geo.spatial_backends import SPATIAL_BACKEND, build_spatial_index, query_knn, query_within
+
+MARKET_RADII_M = {500: "500m", 1000: "1km"}
+MARKET_K = 20
+MARKET_CHUNK_SIZE = 2_000  # query points per neighbor-list batch, bounds the materialized pairs
+ROOMS_BUCKET_MAX = 4       # 4+ rooms share one bucket, -1 (unknown / free layout) is its own
+
+MARKET_COLS = ['ad_deal_type', 'property_id', 'lng', 'lat', 'roomsCount', 'price_last', 'totalArea']
+MARKET_STATS_PATH = "csv/final_datasets/market_stats.csv"
+
+
+def load_market_listings_df(path=CLEANED_OFFERS_PATH) -> pd.DataFrame:
+    """
+    One row per property_id: deal type, rooms bucket, coords and the median
+    price_last / totalArea over the property's ads.
+    """
+    ads_df = pd.read_csv(
+        path,
+        usecols=MARKET_COLS,
+        dtype={'ad_deal_type': str, 'property_id': str, 'lng': np.float64, 'lat': np.float64,
+               'roomsCount': np.float64, 'price_last': np.float64, 'totalArea': np.float64},
+    )
+    fix_lat_lng(ads_df, "lat", "lng")
+
+    area = ads_df['totalArea'].where(ads_df['totalArea'] > 0)
+    ads_df['price_per_m2'] = ads_df['price_last'] / area
+
+    listings_df = ads_df.groupby('property_id', sort=False).agg(
+        ad_deal_type=('ad_deal_type', 'first'),
+        roomsCount=('roomsCount', 'first'),
+        lat=('lat', 'first'),
+        lng=('lng', 'first'),
+        price_per_m2=('price_per_m2', 'median'),
+    ).reset_index()
+
+    rooms = listings_df['roomsCount'].fillna(-1).astype(int)
+    listings_df['rooms_bucket'] = rooms.clip(lower=-1, upper=ROOMS_BUCKET_MAX)
+
+    return listings_df
+
+
+def segment_medians(seg_ids, values, n_segments) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Median and size of each segment for flat (segment id, value) pairs, one sort for all segments.
+    Empty segments get NaN median and 0 size.
+    """
+    order = np.lexsort((values, seg_ids))
+    values = values[order]
+
+    counts = np.bincount(seg_ids, minlength=n_segments)
+    starts = np.cumsum(counts) - counts
+
+    medians = np.full(n_segments, np.nan, dtype=np.float64)
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    medians[has] = (values[lo] + values[hi]) / 2
+
+    return medians, counts
+
+
+def _radius_stats(index, comp_pos, comp_values, query_pos, query_lat, query_lng, radius_m, chunk_size):
+    medians = np.full(len(query_pos), np.nan, dtype=np.float64)
+    counts = np.zeros(len(query_pos), dtype=int)
+
+    for start in range(0, len(query_pos), chunk_size):
+        end = min(start + chunk_size, len(query_pos))
+        pair_query, pair_comp = query_within(index, query_lat[start:end], query_lng[start:end], radius_m)
+
+        not_self = comp_pos[pair_comp] != query_pos[start:end][pair_query]
+        medians[start:end], counts[start:end] = segment_medians(
+            pair_query[not_self], comp_values[pair_comp[not_self]], end - start
+        )
+
+    return medians, counts
+
+
+def _knn_stats(index, comp_pos, comp_values, query_pos, query_lat, query_lng, k, chunk_size):
+    medians = np.full(len(query_pos), np.nan, dtype=np.float64)
+    max_dist = np.full(len(query_pos), np.nan, dtype=np.float64)
+
+    # one extra neighbor to make room for the property itself
+    k_query = min(k + 1, len(comp_pos))
+
+    for start in range(0, len(query_pos), chunk_size):
+        end = min(start + chunk_size, len(query_pos))
+        dist_m, ind = query_knn(index, query_lat[start:end], query_lng[start:end], k_query)
+
+        keep = comp_pos[ind] != query_pos[start:end, None]
+        keep &= np.cumsum(keep, axis=1) <= k
+
+        rows, cols = np.nonzero(keep)
+        medians[start:end], _ = segment_medians(rows, comp_values[ind[rows, cols]], end - start)
+
+        chunk_max = np.where(keep, dist_m, -np.inf).max(axis=1)
+        max_dist[start:end] = np.where(np.isfinite(chunk_max), chunk_max, np.nan)
+
+    return medians, max_dist
+
+
+def add_market_stats(
+    listings_df,
+    radii=MARKET_RADII_M,
+    k=MARKET_K,
+    backend=SPATIAL_BACKEND,
+    chunk_size=MARKET_CHUNK_SIZE,
+):
+    """
+    Local market features per listing from comparables (same deal type and rooms bucket, the listing itself excluded):
+      - market_ppm2_median_<radius>, market_count_<radius>: median price per m2 and number of comparables within radius
+      - market_ppm2_median_knn<k>, market_knn<k>_max_distance_meters: same over the k nearest comparables
+    One spatial index per (deal type, rooms bucket), neighbor queries in chunks,
+    medians reduced over flat neighbor arrays instead of per listing.
+    """
+    n = len(listings_df)
+    lat = listings_df['lat'].to_numpy(dtype=np.float64)
+    lng = listings_df['lng'].to_numpy(dtype=np.float64)
+    ppm2 = listings_df['price_per_m2'].to_numpy(dtype=np.float64)
+
+    out = {}
+    for label in radii.values():
+        out[f'market_ppm2_median_{label}'] = np.full(n, np.nan, dtype=np.float64)
+        out[f'market_count_{label}'] = np.zeros(n, dtype=int)
+    out[f'market_ppm2_median_knn{k}'] = np.full(n, np.nan, dtype=np.float64)
+    out[f'market_knn{k}_max_distance_meters'] = np.full(n, np.nan, dtype=np.float64)
+
+    groups = listings_df.groupby(['ad_deal_type', 'rooms_bucket'], sort=False).indices
+    for query_pos in groups.values():
+        comp_pos = query_pos[~np.isnan(ppm2[query_pos])]
+        if len(comp_pos) == 0:
+            continue
+
+        index = build_spatial_index(lat[comp_pos], lng[comp_pos], backend=backend)
+        comp_values = ppm2[comp_pos]
+        query_lat, query_lng = lat[query_pos], lng[query_pos]
+
+        for radius_m, label in radii.items():
+            medians, counts = _radius_stats(
+                index, comp_pos, comp_values, query_pos, query_lat, query_lng, radius_m, chunk_size
+            )
+            out[f'market_ppm2_median_{label}'][query_pos] = medians
+            out[f'market_count_{label}'][query_pos] = counts
+
+        medians, max_dist = _knn_stats(index, comp_pos, comp_values, query_pos, query_lat, query_lng, k, chunk_size)
+        out[f'market_ppm2_median_knn{k}'][query_pos] = medians
+        out[f'market_knn{k}_max_distance_meters'][query_pos] = max_dist
+
+    for col, values in out.items():
+        listings_df[col] = values
+
+
+def get_market_stats_df(path=CLEANED_OFFERS_PATH, backend=SPATIAL_BACKEND):
+    listings_df = load_market_listings_df(path)
+    add_market_stats(listings_df, backend=backend)
+
+    market_cols = [c for c in listings_df.columns if c.startswith('market_')]
+    listings_df[['property_id'] + market_cols].to_csv(MARKET_STATS_PATH, index=False)
@@ -0,0 +1,157 @@
+import geopandas as gpd
+import numpy as np
+import osmium
+import pandas as pd
+import shapely
+
+# missing node locations at the extract border, broken/incomplete multipolygons
+GEOMETRY_ERRORS = (osmium.InvalidLocationError, RuntimeError)
+
+
+def _tag_keys(tag_sets) -> list[str]:
+    keys = []
+    for tags in tag_sets:
+        keys.extend(k for k in tags if k not in keys)
+    return keys
+
+
+def _matches(tags, tag_sets) -> bool:
+    """
+    osmnx semantics: {key: True} -> any value, {key: str} -> exact value, {key: [..]} -> any of.
+    """
+    for spec in tag_sets:
+        for key, value in spec.items():
+            v = tags.get(key)
+            if v is None:
+                continue
+            if value is True or (isinstance(value, list) and v in value) or v == value:
+                return True
+    return False
+
+
+def _is_linear(tags) -> bool:
+    # waterways are lines even when the way is closed (osmnx does the same)
+    return "waterway" in tags and tags.get("area") != "yes"
+
+
+class _RelationMembersHandler(osmium.SimpleHandler):
+    def __init__(self, relation_id):
+        super().__init__()
+        self.relation_id = relation_id
+        self.way_ids = set()
+
+    def relation(self, r):
+        if r.id == self.relation_id:
+            self.way_ids = {m.ref for m in r.members if m.type == "w"}
+
+
+class _FeaturesHandler(osmium.SimpleHandler):
+    def __init__(self, tag_sets, boundary_way_ids):
+        super().__init__()
+        self.tag_sets = tag_sets
+        self.keys = _tag_keys(tag_sets)
+        self.boundary_way_ids = boundary_way_ids
+        self.wkb = osmium.geom.WKBFactory()
+
+        self.rows = []           # (element_type, osmid, wkb, {key: value})
+        self.boundary_wkb = []   # member ways of the boundary relation
+
+    def _add(self, element_type, osmid, wkb, tags):
+        self.rows.append((element_type, osmid, wkb, {k: tags.get(k) for k in self.keys}))
+
+    def node(self, n):
+        if n.tags and _matches(n.tags, self.tag_sets):
+            self._add("node", n.id, self.wkb.create_point(n), n.tags)
+
+    def way(self, w):
+        if w.id in self.boundary_way_ids:
+            try:
+                self.boundary_wkb.append(self.wkb.create_linestring(w))
+            except GEOMETRY_ERRORS:  # missing node locations at the extract border
+                print(f"warning: boundary way {w.id} has missing node locations, skipped")
+
+        # closed non-linear ways come through area()
+        if not w.tags or (w.is_closed() and not _is_linear(w.tags)):
+            return
+        if _matches(w.tags, self.tag_sets):
+            try:
+                self._add("way", w.id, self.wkb.create_linestring(w), w.tags)
+            except GEOMETRY_ERRORS:  # missing node locations at the extract border
+                pass
+
+    def area(self, a):
+        if not a.tags or (a.from_way() and _is_linear(a.tags)):
+            return
+        if _matches(a.tags, self.tag_sets):
+            try:
+                self._add("way" if a.from_way() else "relation", a.orig_id(),
+                          self.wkb.create_multipolygon(a), a.tags)
+            except GEOMETRY_ERRORS:  # broken/incomplete multipolygon
+                pass
+
+
+def read_pbf_features(pbf_path, tag_sets, boundary_relation_id=None):
+    """
+    Stream a local .osm.pbf and collect every element matching any of tag_sets,
+    all labels in the same pass (no per-label reads).
+
+    Returns:
+        features: GeoDataFrame (EPSG:4326) indexed like osmnx output by (element_type, osmid),
+                  with one column per tag key used in tag_sets
+        boundary_lines: shapely LineStrings of the member ways of boundary_relation_id
+                        (e.g. MKAD), empty if not requested
+
+    Relations come after the ways in a PBF, so multipolygon assembly needs a
+    relations-only first read before the main one. The boundary relation members
+    are collected in that same first read, next to osmium's area manager, so the
+    file is read twice in total (what apply_file with an area callback does anyway).
+    """
+    areas = osmium.area.AreaManager()
+    members = _RelationMembersHandler(boundary_relation_id)
+    with osmium.io.Reader(str(pbf_path), osmium.osm.osm_entity_bits.RELATION) as reader:
+        osmium.apply(reader, areas.first_pass_handler(), members)
+
+    handler = _FeaturesHandler(tag_sets, members.way_ids)
+    locations = osmium.NodeLocationsForWays(osmium.index.create_map("flex_mem"))
+    locations.ignore_errors()  # missing nodes surface as GEOMETRY_ERRORS in the handler
+    with osmium.io.Reader(str(pbf_path)) as reader:
+        osmium.apply(reader, locations, areas.second_pass_handler(handler), handler)
+
+    if handler.rows:
+        element_type, osmid, wkb, tags = zip(*handler.rows)
+        geometry = shapely.from_wkb(np.array(wkb, dtype=object))
+    else:
+        element_type, osmid, geometry, tags = (), (), np.array([], dtype=object), ()
+
+    # multipolygons with a single part are plain polygons in osmnx output
+    single_part = (shapely.get_type_id(geometry) == 6) & (shapely.get_num_geometries(geometry) == 1)
+    geometry[single_part] = shapely.get_geometry(geometry[single_part], 0)
+
+    features = gpd.GeoDataFrame(
+        pd.DataFrame(list(tags), columns=handler.keys),
+        geometry=geometry,
+        crs="EPSG:4326",
+    )
+    features.index = pd.MultiIndex.from_arrays([list(element_type), list(osmid)], names=["element_type", "osmid"])
+
+    boundary_lines = list(shapely.from_wkb(np.array(handler.boundary_wkb, dtype=object)))
+    return features, boundary_lines
+
+
+def select_features(features: gpd.GeoDataFrame, tags: dict) -> gpd.GeoDataFrame:
+    """
+    Rows of read_pbf_features output matching one osmnx-style tag dict.
+    """
+    mask = pd.Series(False, index=features.index)
+    for key, value in tags.items():
+        if key not in features.columns:
+            continue
+        col = features[key]
+        if value is True:
+            mask |= col.notna()
+        elif isinstance(value, list):
+            mask |= col.isin(value)
+        else:
+            mask |= col == value
+
+    return features[mask.to_numpy()].copy()
@@ -0,0 +1,183 @@
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from pyproj import Transformer
+from scipy.spatial import cKDTree
+from sklearn.neighbors import BallTree
+
+EARTH_R = 6_371_000.0
+
+# "haversine": BallTree on radians, exact great-circle distances
+# "projected": cKDTree on planar coords in a metric CRS (UTM 37N for Moscow), faster,
+#              scale error ~0.05% inside MKAD (see compare_spatial_backends)
+SPATIAL_BACKENDS = ("haversine", "projected")
+SPATIAL_BACKEND = "haversine"
+SPATIAL_METRIC_EPSG = 32637  # UTM 37N, same as OSM_METRIC_EPSG
+
+COUNT_CHUNK_SIZE = 10_000  # query points per count batch
+
+
+@lru_cache(maxsize=None)
+def _to_metric(metric_epsg: int) -> Transformer:
+    return Transformer.from_crs("EPSG:4326", f"EPSG:{metric_epsg}", always_xy=True)
+
+
+def _index_coords(index, lat, lng) -> np.ndarray:
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+
+    if index["backend"] == "haversine":
+        return np.deg2rad(np.column_stack([lat, lng]))
+
+    x, y = _to_metric(index["metric_epsg"]).transform(lng, lat)
+    return np.column_stack([x, y])
+
+
+def build_spatial_index(lat, lng, backend=SPATIAL_BACKEND, metric_epsg=SPATIAL_METRIC_EPSG) -> dict:
+    """
+    Nearest/count index over points given in degrees. Distances in and out are meters for both backends.
+    """
+    if backend not in SPATIAL_BACKENDS:
+        raise ValueError(f"unknown backend = '{backend}', only {SPATIAL_BACKENDS} are supported")
+
+    index = {"backend": backend, "metric_epsg": metric_epsg}
+    coords = _index_coords(index, lat, lng)
+    index["tree"] = BallTree(coords, metric='haversine') if backend == "haversine" else cKDTree(coords)
+
+    return index
+
+
+def query_nearest(index, lat, lng) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (distance in meters, position of the nearest indexed point) for each query point.
+    """
+    coords = _index_coords(index, lat, lng)
+
+    if index["backend"] == "haversine":
+        dist_rad, ind = index["tree"].query(coords, k=1, return_distance=True)
+        return (dist_rad[:, 0] * EARTH_R).astype(np.float64), ind[:, 0]
+
+    dist_m, ind = index["tree"].query(coords, k=1)
+    return dist_m.astype(np.float64), ind
+
+
+def _count_chunk(index, chunk_coords, thresholds_m):
+    counts = np.empty((len(chunk_coords), len(thresholds_m)), dtype=int)
+    for j, r in enumerate(thresholds_m):
+        if index["backend"] == "haversine":
+            counts[:, j] = index["tree"].query_radius(chunk_coords, r=r / EARTH_R, count_only=True)
+        else:
+            counts[:, j] = index["tree"].query_ball_point(chunk_coords, r=r, return_length=True)
+    return counts
+
+
+def count_within(index, lat, lng, thresholds_m, chunk_size=COUNT_CHUNK_SIZE, n_jobs=1) -> np.ndarray:
+    """
+    (n_points, n_thresholds) matrix of indexed points within each radius in meters (inclusive).
+    Count-only queries, so neighbor lists are never materialized;
+    chunks of query points are optionally spread over n_jobs threads.
+    """
+    coords = _index_coords(index, lat, lng)
+
+    chunks = [coords[start:start + chunk_size] for start in range(0, len(coords), chunk_size)]
+    if not chunks:
+        return np.zeros((0, len(thresholds_m)), dtype=int)
+
+    if n_jobs == 1:
+        results = [_count_chunk(index, chunk, thresholds_m) for chunk in chunks]
+    else:
+        results = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(_count_chunk)(index, chunk, thresholds_m) for chunk in chunks
+        )
+
+    return np.vstack(results)
+
+
+def query_knn(index, lat, lng, k) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (n_points, k) matrices of distances in meters and positions of the k nearest indexed points, closest first.
+    """
+    coords = _index_coords(index, lat, lng)
+
+    if index["backend"] == "haversine":
+        dist_rad, ind = index["tree"].query(coords, k=k, return_distance=True)
+        return (dist_rad * EARTH_R).astype(np.float64), ind
+
+    dist_m, ind = index["tree"].query(coords, k=k)
+    dist_m, ind = dist_m.reshape(len(coords), k), ind.reshape(len(coords), k)  # k=1 comes back 1d
+    return dist_m.astype(np.float64), ind
+
+
+def query_within(index, lat, lng, radius_m) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Flattened neighbor lists within radius_m (inclusive): (query position, indexed position) pairs.
+    Callers chunk the query points, the pairs are materialized.
+    """
+    coords = _index_coords(index, lat, lng)
+    if len(coords) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    if index["backend"] == "haversine":
+        ind = index["tree"].query_radius(coords, r=radius_m / EARTH_R)
+    else:
+        ind = index["tree"].query_ball_point(coords, r=radius_m)
+
+    lengths = np.fromiter(map(len, ind), dtype=np.int64, count=len(ind))
+    query_pos = np.repeat(np.arange(len(ind), dtype=np.int64), lengths)
+    neighbor_pos = np.concatenate([np.asarray(i, dtype=np.int64) for i in ind])
+    return query_pos, neighbor_pos
+
+
+# -------------------- BENCHMARK / ACCURACY --------------------
+
+def compare_spatial_backends(
+    query_lat,
+    query_lng,
+    objects_lat,
+    objects_lng,
+    thresholds_m,
+    metric_epsg=SPATIAL_METRIC_EPSG,
+    n_jobs=1,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Runs the same nearest + count queries on every backend.
+    Returns:
+        timings: backend, build_s, nearest_s, count_s
+        accuracy: metric, value -- "projected" against the exact "haversine" reference
+    """
+    timings, results = [], {}
+    for backend in SPATIAL_BACKENDS:
+        t0 = time.perf_counter()
+        index = build_spatial_index(objects_lat, objects_lng, backend=backend, metric_epsg=metric_epsg)
+        t1 = time.perf_counter()
+        dist_m, ind = query_nearest(index, query_lat, query_lng)
+        t2 = time.perf_counter()
+        counts = count_within(index, query_lat, query_lng, thresholds_m, n_jobs=n_jobs)
+        t3 = time.perf_counter()
+
+        timings.append({"backend": backend, "build_s": t1 - t0, "nearest_s": t2 - t1, "count_s": t3 - t2})
+        results[backend] = (dist_m, ind, counts)
+
+    ref_dist, ref_ind, ref_counts = results["haversine"]
+    dist, ind, counts = results["projected"]
+
+    abs_err = np.abs(dist - ref_dist)
+    rel_err = abs_err / np.maximum(ref_dist, 1.0)
+    accuracy = {
+        "nearest_dist_abs_err_mean_m": abs_err.mean() if len(abs_err) else np.nan,
+        "nearest_dist_abs_err_p99_m": np.quantile(abs_err, 0.99) if len(abs_err) else np.nan,
+        "nearest_dist_abs_err_max_m": abs_err.max() if len(abs_err) else np.nan,
+        "nearest_dist_rel_err_max": rel_err.max() if len(rel_err) else np.nan,
+        "nearest_idx_mismatch_share": (ind != ref_ind).mean() if len(ind) else np.nan,
+    }
+
+    count_diff = np.abs(counts - ref_counts)
+    for j, r in enumerate(thresholds_m):
+        accuracy[f"count_{r:g}m_mismatch_share"] = (count_diff[:, j] > 0).mean() if len(count_diff) else np.nan
+        accuracy[f"count_{r:g}m_abs_diff_max"] = count_diff[:, j].max() if len(count_diff) else np.nan
+
+    accuracy = pd.DataFrame({"metric": list(accuracy.keys()), "value": list(accuracy.values())})
+    return pd.DataFrame(timings), accuracy
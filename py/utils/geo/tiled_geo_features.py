@@ -0,0 +1,261 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from py.utils.geo.coords_features_gen import (
+    CLEANED_OFFERS_PATH,
+    COUNT_THRESHOLDS,
+    OSM_GPKG_LAYER,
+    OSM_GPKG_PATH,
+    OSM_LABELS,
+    STATIONS_PATH,
+    _add_walk_features,
+    add_closest_osm_features,
+    add_distance_to_center,
+    get_closest_ads_count,
+    get_closest_station_objects,
+    load_coords_dfs,
+    load_osm_features_edges_gdf,
+    load_stations_index,
+)
+from py.utils.geo.spatial_backends import SPATIAL_BACKEND
+from py.utils.geo.walk_network import WALK_GRAPH_PATH
+
+TILE_SIZE_DEG = 0.5
+# margin around each tile: must cover the largest ads count radius (5km)
+TILE_BUFFER_M = 6_000.0
+# OSM nearest edge is searched in growing margins up to this distance
+TILE_MAX_BUFFER_M = 200_000.0
+
+M_PER_DEG_LAT = 111_320.0
+# tiles submitted to the pool ahead of the finished ones, per worker
+TILES_IN_FLIGHT_PER_WORKER = 2
+
+
+def utm_epsg(lat, lng) -> int:
+    """
+    WGS84 / UTM zone EPSG code for a point (326xx north, 327xx south); Moscow -> 32637.
+    """
+    zone = int((lng + 180) // 6) + 1
+    return (32600 if lat >= 0 else 32700) + zone
+
+
+def _grid_index(deg, offset, tile_size_deg):
+    return np.floor((np.asarray(deg, dtype=np.float64) + offset) / tile_size_deg).astype(np.int64)
+
+
+def assign_tiles(lat, lng, tile_size_deg=TILE_SIZE_DEG) -> np.ndarray:
+    """
+    Tile id per point on a regular lat/lng grid.
+    """
+    return _grid_index(lat, 90, tile_size_deg) * 1_000_000 + _grid_index(lng, 180, tile_size_deg)
+
+
+def _buffered_bbox(lat, lng, buffer_m) -> tuple[float, float, float, float]:
+    """
+    (minx, miny, maxx, maxy) in degrees around points, conservative for longitude at the tile's extreme latitude.
+    """
+    max_abs_lat = min(float(np.max(np.abs(lat))) + buffer_m / M_PER_DEG_LAT, 89.0)
+    dlat = buffer_m / M_PER_DEG_LAT
+    dlng = buffer_m / (M_PER_DEG_LAT * np.cos(np.deg2rad(max_abs_lat)))
+    return (float(np.min(lng)) - dlng, float(np.min(lat)) - dlat, float(np.max(lng)) + dlng, float(np.max(lat)) + dlat)
+
+
+def _in_bbox(df, bbox, lng_col="lng", lat_col="lat") -> np.ndarray:
+    minx, miny, maxx, maxy = bbox
+    lng = df[lng_col].to_numpy()
+    lat = df[lat_col].to_numpy()
+    return (lng >= minx) & (lng <= maxx) & (lat >= miny) & (lat <= maxy)
+
+
+def _add_tile_osm_features(tile_df, metric_epsg, gpkg_path, layer, labels, buffer_m, max_buffer_m):
+    """
+    Nearest OSM edges from features read around the tile only. A result farther than
+    the margin could be beaten by a feature outside the read bbox, so those points
+    are redone with a doubled margin.
+    """
+    dist_cols = [f"closest_{lab}_distance_meters" for lab in labels]
+    for lab in labels:
+        for col in [f"closest_{lab}_distance_meters", f"closest_{lab}_lat", f"closest_{lab}_lng"]:
+            tile_df[col] = np.nan
+
+    todo = np.ones(len(tile_df), dtype=bool)
+    margin = buffer_m
+
+    while todo.any():
+        sub_df = tile_df.loc[todo, ['lng', 'lat']].copy()
+        bbox = _buffered_bbox(sub_df['lat'].to_numpy(), sub_df['lng'].to_numpy(), margin)
+        osm_edges_gdf = load_osm_features_edges_gdf(gpkg_path, layer=layer, metric_epsg=metric_epsg, bbox=bbox)
+
+        add_closest_osm_features(sub_df, osm_edges_gdf, labels=labels, metric_epsg=metric_epsg)
+        osm_cols = [c for c in sub_df.columns if c not in ('lng', 'lat')]
+        tile_df.loc[todo, osm_cols] = sub_df[osm_cols].to_numpy()
+
+        if margin >= max_buffer_m:
+            break
+
+        dist = tile_df.loc[todo, dist_cols].to_numpy()
+        unsure = (np.isnan(dist) | (dist > margin)).any(axis=1)
+
+        todo_ix = np.flatnonzero(todo)
+        todo[:] = False
+        todo[todo_ix[unsure]] = True
+        margin = min(margin * 2, max_buffer_m)
+
+
+def _compute_tile(tile_df, ads_df, stations_index, gpkg_path, layer, labels, buffer_m, max_buffer_m, backend):
+    tile_df = tile_df.copy()
+    metric_epsg = utm_epsg(tile_df['lat'].mean(), tile_df['lng'].mean())
+
+    add_distance_to_center(tile_df)
+    for suffix in ['subway', 'mcd']:
+        stations_df, spatial_index = stations_index[suffix]
+        get_closest_station_objects(tile_df, stations_df, suffix=suffix, spatial_index=spatial_index)
+
+    # ads within the margin are all that can fall within the largest count radius
+    if len(ads_df) > 0:
+        get_closest_ads_count(tile_df, ads_df, backend=backend)
+
+    _add_tile_osm_features(tile_df, metric_epsg, gpkg_path, layer, labels, buffer_m, max_buffer_m)
+    return tile_df
+
+
+# per-process state of the tile pool: the stations index is shipped once per worker
+_TILE_WORKER_STATIONS_INDEX = None
+
+
+def _init_tile_worker(stations_index):
+    global _TILE_WORKER_STATIONS_INDEX
+    _TILE_WORKER_STATIONS_INDEX = stations_index
+
+
+def _tile_worker_task(tile_df, ads_df, *args):
+    return _compute_tile(tile_df, ads_df, _TILE_WORKER_STATIONS_INDEX, *args)
+
+
+def _iter_tiles(properties_coords_df, ads_coords_df, tile_ids, buffer_m, tile_size_deg):
+    """
+    (tile_df, ads within the tile's margin), one tile at a time.
+    Properties and ads are sorted by tile id once: a tile is a slice of the properties and
+    its ads candidates are slices of the grid rows its margin overlaps, no scan over all rows per tile.
+    """
+    order = np.argsort(tile_ids, kind="stable")
+    sorted_tile_ids = tile_ids[order]
+    _, starts = np.unique(sorted_tile_ids, return_index=True)
+    ends = np.append(starts[1:], len(order))
+
+    ads_tile_ids = assign_tiles(ads_coords_df['lat'], ads_coords_df['lng'], tile_size_deg)
+    ads_order = np.argsort(ads_tile_ids, kind="stable")
+    ads_sorted_df = ads_coords_df.iloc[ads_order]
+    ads_sorted_tile_ids = ads_tile_ids[ads_order]
+
+    for start, end in zip(starts, ends):
+        tile_df = properties_coords_df.iloc[order[start:end]]
+        bbox = _buffered_bbox(tile_df['lat'].to_numpy(), tile_df['lng'].to_numpy(), buffer_m)
+
+        # grid cells overlapped by the bbox: one contiguous tile id range per grid row
+        minx, miny, maxx, maxy = bbox
+        ix_min, ix_max = _grid_index(minx, 180, tile_size_deg), _grid_index(maxx, 180, tile_size_deg)
+        candidates = [
+            np.arange(
+                np.searchsorted(ads_sorted_tile_ids, iy * 1_000_000 + ix_min, side="left"),
+                np.searchsorted(ads_sorted_tile_ids, iy * 1_000_000 + ix_max, side="right"),
+            )
+            for iy in range(_grid_index(miny, 90, tile_size_deg), _grid_index(maxy, 90, tile_size_deg) + 1)
+        ]
+        candidates_df = ads_sorted_df.iloc[np.concatenate(candidates)]
+        yield tile_df, candidates_df[_in_bbox(candidates_df, bbox)]
+
+
+def compute_geo_features_tiled(
+    properties_coords_df,
+    ads_coords_df,
+    tile_size_deg=TILE_SIZE_DEG,
+    buffer_m=TILE_BUFFER_M,
+    max_buffer_m=TILE_MAX_BUFFER_M,
+    gpkg_path=OSM_GPKG_PATH,
+    layer=OSM_GPKG_LAYER,
+    labels=OSM_LABELS,
+    stations_path=STATIONS_PATH,
+    backend=SPATIAL_BACKEND,
+    n_jobs=1,
+    walk_graph_path=WALK_GRAPH_PATH,
+) -> pd.DataFrame:
+    """
+    Same features as get_geo_features_df, computed tile by tile:
+      - properties are split into tile_size_deg grid tiles
+      - each tile gets only the ads and OSM features within buffer_m of it,
+        OSM distances are computed in the tile's own UTM zone
+      - tiles run independently (process pool if n_jobs > 1) and are stitched back in input order
+    Besides the stitched output, memory is bounded by the tiles in flight, not by the whole region.
+    Walking distance to the subway (if walk_graph_path exists) is added once on the stitched output:
+    the walk graph is a single city graph and one multi-source Dijkstra labels all of it.
+    """
+    if buffer_m < max(COUNT_THRESHOLDS):
+        raise ValueError(f"buffer_m = {buffer_m} is smaller than the largest count radius {max(COUNT_THRESHOLDS)}")
+
+    properties_coords_df = properties_coords_df.reset_index(drop=True)
+    stations_index = load_stations_index(stations_path, backend=backend)
+    tile_ids = assign_tiles(properties_coords_df['lat'], properties_coords_df['lng'], tile_size_deg)
+
+    tiles = _iter_tiles(properties_coords_df, ads_coords_df, tile_ids, buffer_m, tile_size_deg)
+    args = (gpkg_path, layer, labels, buffer_m, max_buffer_m, backend)
+
+    print(f"{len(properties_coords_df)} properties in {len(np.unique(tile_ids))} tiles")
+
+    if n_jobs == 1:
+        results = [_compute_tile(tile_df, tile_ads_df, stations_index, *args) for tile_df, tile_ads_df in tiles]
+    else:
+        n_workers = os.cpu_count() if n_jobs == -1 else n_jobs
+        max_in_flight = n_workers * TILES_IN_FLIGHT_PER_WORKER
+        results, in_flight = [], set()
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_tile_worker,
+            initargs=(stations_index,),
+        ) as pool:
+            # tiles are cut and submitted lazily, only a few of them wait in the pool at a time
+            for tile_df, tile_ads_df in tiles:
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    results.extend(fut.result() for fut in done)
+                in_flight.add(pool.submit(_tile_worker_task, tile_df, tile_ads_df, *args))
+            results.extend(fut.result() for fut in wait(in_flight)[0])
+
+    out = pd.concat(results).sort_index()
+
+    if os.path.exists(walk_graph_path):
+        _add_walk_features(out, stations_path=stations_path, graph_path=walk_graph_path)
+    else:
+        print(f"{walk_graph_path} not found, skipping walking distance features")
+
+    # a deal type missing around a tile means zero ads, not unknown
+    ads_cols = [
+        f"{deal_type}_within{label}"
+        for deal_type in pd.unique(ads_coords_df['ad_deal_type'].astype(str))
+        for label in COUNT_THRESHOLDS.values()
+    ]
+    for col in ads_cols:
+        out[col] = out[col].fillna(0).astype(int) if col in out.columns else 0
+
+    # single-pass column order
+    head_cols = [c for c in out.columns if c not in ads_cols and not c.startswith("closest_")]
+    osm_cols = [c for c in out.columns if c.startswith("closest_")]
+    return out[head_cols + ads_cols + osm_cols]
+
+
+def get_geo_features_df_tiled(tile_size_deg=TILE_SIZE_DEG, n_jobs=1, backend=SPATIAL_BACKEND):
+    properties_coords_df, ads_coords_df = load_coords_dfs(CLEANED_OFFERS_PATH)
+
+    properties_coords_df = compute_geo_features_tiled(
+        properties_coords_df, ads_coords_df, tile_size_deg=tile_size_deg, n_jobs=n_jobs, backend=backend
+    )
+    properties_coords_df = properties_coords_df.drop_duplicates().reset_index()
+
+    uniq_coords = (properties_coords_df['lng'].astype(str) + '_' + properties_coords_df['lat'].astype(str)).unique().shape[0]
+    if properties_coords_df.shape[0] != uniq_coords:
+        raise ValueError("something is wrong (coords are not unique)")
+
+    properties_coords_df.to_csv("csv/final_datasets/geo_features.csv", index=False)
@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from py.utils.general.file_hash import file_sha256
+from py.utils.geo.geo_features_cache import GEO_CACHE_DIR, load_cached, save_cached
+
+WALK_GRAPH_PATH = "graphml/moscow_walk.graphml"
+WALK_METRIC_EPSG = 32637  # UTM 37N
+MIN_SNAP_M = 1e-3  # station exactly on a node: csgraph would read a zero weight as no edge
+
+
+def prepare_walk_graph(place="Moscow, Russia", path=WALK_GRAPH_PATH):
+    """
+    One-off: download the pedestrian network with osmnx and save it as GraphML.
+    """
+    import osmnx as ox
+
+    graph = ox.graph_from_place(place, network_type="walk")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    ox.save_graphml(graph, path)
+    print(f"Saved: walk graph ({graph.number_of_nodes()} nodes) to {path}")
+
+
+def _to_metric_xy(lat, lng, metric_epsg) -> np.ndarray:
+    to_metric = Transformer.from_crs("EPSG:4326", f"EPSG:{metric_epsg}", always_xy=True)
+    x, y = to_metric.transform(np.asarray(lng, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+    return np.column_stack([x, y])
+
+
+def load_walk_graph(path=WALK_GRAPH_PATH, metric_epsg=WALK_METRIC_EPSG, cache_dir=GEO_CACHE_DIR) -> dict:
+    """
+    GraphML -> {"node_xy": (n, 2) metric coords, "csr": sparse edge lengths in meters}.
+    Parsing GraphML is slow, so the arrays are cached keyed by the file hash.
+    """
+    fingerprint = f"{file_sha256(path)}_{metric_epsg}"
+
+    graph = load_cached("walk_graph", fingerprint, cache_dir)
+    if graph is None:
+        import osmnx as ox
+
+        g = ox.load_graphml(path)
+        nodes = list(g.nodes)
+        node_pos = {node: i for i, node in enumerate(nodes)}
+
+        node_xy = _to_metric_xy(
+            [g.nodes[node]["y"] for node in nodes],
+            [g.nodes[node]["x"] for node in nodes],
+            metric_epsg,
+        )
+
+        edges = pd.DataFrame(
+            [(node_pos[u], node_pos[v], data.get("length", np.nan)) for u, v, data in g.edges(data=True)],
+            columns=["u", "v", "length"],
+        ).dropna()
+        # parallel edges of the multigraph: keep the shortest one
+        edges = edges.groupby(["u", "v"], as_index=False)["length"].min()
+
+        csr = csr_matrix(
+            (edges["length"].to_numpy(dtype=np.float64), (edges["u"].to_numpy(), edges["v"].to_numpy())),
+            shape=(len(nodes), len(nodes)),
+        )
+
+        graph = {"node_xy": node_xy, "csr": csr}
+        save_cached("walk_graph", fingerprint, graph, cache_dir)
+
+    return graph
+
+
+def add_walk_distance_to_stations(properties_coords_df, stations_df, suffix, graph, metric_epsg=WALK_METRIC_EPSG):
+    """
+    Adds nearest_<suffix>_walk_station and nearest_<suffix>_walk_distance_meters:
+    walking distance over the pedestrian network to the closest station.
+
+    Every station gets a virtual node linked to its snapped graph node by its snap leg,
+    so one multi-source Dijkstra from the virtual nodes labels every graph node with the
+    closest station, snap leg included; properties are snapped through a KD-tree and
+    their straight snap leg is added on top.
+    """
+    node_tree = cKDTree(graph["node_xy"])
+    csr = graph["csr"]
+    n_nodes, n_stations = csr.shape[0], len(stations_df)
+
+    stations_xy = _to_metric_xy(stations_df["lat"], stations_df["lon"], metric_epsg)
+    st_snap_m, st_node = node_tree.query(stations_xy)
+
+    coo = csr.tocoo()
+    virtual_nodes = n_nodes + np.arange(n_stations)
+    augmented = csr_matrix(
+        (
+            np.concatenate([coo.data, np.maximum(st_snap_m, MIN_SNAP_M)]),
+            (np.concatenate([coo.row, virtual_nodes]), np.concatenate([coo.col, st_node])),
+        ),
+        shape=(n_nodes + n_stations, n_nodes + n_stations),
+    )
+
+    net_m, _, sources = dijkstra(
+        augmented,
+        directed=False,
+        indices=virtual_nodes,
+        min_only=True,
+        return_predecessors=True,
+    )
+
+    props_xy = _to_metric_xy(properties_coords_df["lat"], properties_coords_df["lng"], metric_epsg)
+    p_snap_m, p_node = node_tree.query(props_xy)
+
+    src = sources[p_node]
+    reachable = src >= 0
+    station_pos = src[reachable] - n_nodes
+
+    dist = np.full(len(properties_coords_df), np.nan, dtype=np.float64)
+    dist[reachable] = p_snap_m[reachable] + net_m[p_node[reachable]]
+
+    names = np.full(len(properties_coords_df), None, dtype=object)
+    names[reachable] = stations_df["station_name"].to_numpy()[station_pos]
+
+    properties_coords_df[f"nearest_{suffix}_walk_station"] = names
+    properties_coords_df[f"nearest_{suffix}_walk_distance_meters"] = dist
@@ -0,0 +1,77 @@
+import asyncio
+import random
+
+import aiohttp
+from yadisk.exceptions import YaDiskError
+
+from py.utils.yadisk.rate_limiter import _status_of, limited, retry_after_of
+
+LIST_PAGE = 100  # items per listdir call
+
+# network / server side failures; anything else (a bug, a bad argument) won't pass on a retry
+RETRIABLE_ERRORS = (YaDiskError, aiohttp.ClientError, asyncio.TimeoutError, ConnectionError)
+
+
+def _is_retriable(e) -> bool:
+    """4xx other than 429 (PathNotFoundError, forbidden...) won't change on a retry either."""
+    if not isinstance(e, RETRIABLE_ERRORS):
+        return False
+    status = _status_of(e)
+    return status is None or status == 429 or status >= 500
+
+
+def _field(obj, key, default=None):
+    """Safely get attribute/field from YaDiskObject or dict."""
+    if obj is None:
+        return default
+    try:
+        return getattr(obj, key)
+    except AttributeError:
+        try:
+            return obj[key]
+        except Exception:
+            return default
+
+async def _collect(agen) -> list:
+    return [x async for x in agen]
+
+
+async def _listdir_paged(y, path, fields, batch=LIST_PAGE) -> list:
+    """
+    All items of a dir, each page a separate call under the rate limiter:
+    a bare listdir pages on internally and would be charged as one request.
+    """
+    items = []
+    offset = 0
+    while True:
+        chunk = await limited(lambda: _collect(y.listdir(
+            path,
+            limit=batch,
+            offset=offset,
+            max_items=batch,  # this page only, listdir would otherwise page on to the end
+            fields=fields,
+        )))
+        items.extend(chunk)
+        if len(chunk) < batch:
+            return items
+        offset += batch
+
+
+async def _retry(coro_factory, *, max_tries=5, base=0.5, cap=5.0, measure_latency=True):
+    """
+    Retry an awaited call with exponential backoff + jitter.
+    Every attempt goes through the process-wide rate limiter.
+    Respects HTTP 429 Retry-After if available on exception.response.
+    Non-retriable errors (see _is_retriable) are raised right away.
+    """
+    for attempt in range(1, max_tries + 1):
+        try:
+            return await limited(coro_factory, measure_latency=measure_latency)
+        except Exception as e:
+            if attempt == max_tries or not _is_retriable(e):
+                raise
+            retry_after = retry_after_of(e)
+            delay = retry_after if retry_after is not None else min(cap, base * (2 ** (attempt - 1)))
+            # jitter ±40% around delay
+            jitter = delay * (0.6 + 0.8 * random.random())
+            await asyncio.sleep(jitter)
@@ -0,0 +1,175 @@
+import asyncio
+import pathlib
+import time
+
+import aiohttp
+import nest_asyncio
+import yadisk
+from yadisk.exceptions import YaDiskError
+
+from py.utils.general.file_hash import READ_CHUNK, file_md5
+from py.utils.yadisk.async_utils import _listdir_paged
+from py.utils.yadisk.rate_limiter import limited
+
+
+nest_asyncio.apply()
+
+PART_SUFFIX = ".part"
+
+
+async def _is_up_to_date(dst: pathlib.Path, size, md5) -> bool:
+    """
+    Local file matches remote metadata: size first (cheap), then md5 (in a thread).
+    """
+    if not dst.exists() or size is None or dst.stat().st_size != size:
+        return False
+    if not md5:
+        return True
+    return await asyncio.to_thread(file_md5, dst) == md5
+
+
+async def _list_files_recursive(y, remote_dir: str, local_dir: pathlib.Path, batch: int):
+    """
+    Walk remote dir and return a flat list of (remote_path, local_path, size, md5).
+    """
+    files = []
+    for res in await _listdir_paged(y, remote_dir, ["name", "path", "type", "size", "md5"], batch):
+        dst = local_dir / res.name
+        if res.type == "dir":
+            files.extend(await _list_files_recursive(y, res.path, dst, batch))
+        else:
+            files.append((res.path, dst, res.size, res.md5))
+    return files
+
+
+async def _download_one(y, session, remote_path, dst: pathlib.Path, size):
+    """
+    Download one file into <dst>.part, resuming from its current size via HTTP Range,
+    then move it into place. Returns number of bytes transferred in this call.
+    """
+    part = dst.with_name(dst.name + PART_SUFFIX)
+    part.parent.mkdir(parents=True, exist_ok=True)
+
+    start = part.stat().st_size if part.exists() else 0
+    if size is not None and start > size:
+        part.unlink()
+        start = 0
+
+    transferred = 0
+    if size is None or start < size:
+        href = await limited(lambda: y.get_download_link(remote_path))
+        headers = {"Range": f"bytes={start}-"} if start > 0 else {}
+
+        async with session.get(href, headers=headers) as resp:
+            resp.raise_for_status()
+            # server ignored Range -> start from scratch
+            mode = "ab" if (start > 0 and resp.status == 206) else "wb"
+            with open(part, mode) as f:
+                async for block in resp.content.iter_chunked(READ_CHUNK):
+                    f.write(block)
+                    transferred += len(block)
+
+    part.replace(dst)
+    return transferred
+
+
+async def download_dir_async(
+    token: str,
+    remote_dir: str,
+    local_dir,
+    batch: int = 500,
+    concurrency: int = 8,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+) -> dict:
+    """
+    Download remote_dir recursively with bounded concurrency.
+      - files with matching size/md5 already present locally are skipped
+      - interrupted transfers are resumed from <file>.part
+    Returns a stats dict (files, skipped, bytes, seconds, mb_per_s).
+    """
+    local_dir = pathlib.Path(local_dir)
+    local_dir.mkdir(parents=True, exist_ok=True)
+
+    stats = {"files": 0, "skipped": 0, "failed": 0, "bytes": 0}
+    started = time.monotonic()
+
+    async with yadisk.AsyncClient(token=token) as y:
+        files = await _list_files_recursive(y, remote_dir, local_dir, batch)
+        total_size = sum(size or 0 for _, _, size, _ in files)
+        print(f"{len(files)} files, {total_size / 1024 ** 3:.2f} GiB in {remote_dir}")
+
+        sem = asyncio.Semaphore(concurrency)
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=120)
+
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+
+            async def fetch(remote_path, dst, size, md5):
+                async with sem:
+                    if await _is_up_to_date(dst, size, md5):
+                        stats["skipped"] += 1
+                        return
+
+                    attempt = 0
+                    delay = base_delay
+                    while True:
+                        attempt += 1
+                        try:
+                            stats["bytes"] += await _download_one(y, session, remote_path, dst, size)
+                            break
+                        except (aiohttp.ClientError, YaDiskError, asyncio.TimeoutError) as e:
+                            if attempt >= max_retries:
+                                print(f"{remote_path}: giving up after {attempt} attempts ({e})")
+                                stats["failed"] += 1
+                                raise
+                            print(f"{remote_path}: attempt {attempt} failed ({e}), "
+                                  f"resuming in {delay:.1f}s...")
+                            await asyncio.sleep(delay)
+                            delay *= 2
+
+                    if md5 and await asyncio.to_thread(file_md5, dst) != md5:
+                        dst.unlink()
+                        stats["failed"] += 1
+                        raise ValueError(f"md5 mismatch for {remote_path}")
+
+                    stats["files"] += 1
+                    print(f"downloaded {dst.name}")
+
+            # let the other transfers finish even if one fails, so a rerun resumes less
+            results = await asyncio.gather(*(fetch(*f) for f in files), return_exceptions=True)
+
+    stats["seconds"] = time.monotonic() - started
+    stats["mb_per_s"] = stats["bytes"] / 1024 ** 2 / max(stats["seconds"], 1e-9)
+
+    print(
+        f"downloaded {stats['files']} files ({stats['bytes'] / 1024 ** 2:.1f} MiB), "
+        f"skipped {stats['skipped']}, failed {stats['failed']}, "
+        f"{stats['seconds']:.1f}s, {stats['mb_per_s']:.1f} MiB/s"
+    )
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise errors[0]
+
+    return stats
+
+
+def download_dir_sync(
+    token: str,
+    remote_dir: str,
+    local_dir,
+    batch: int = 500,
+    concurrency: int = 8,
+    max_retries: int = 5,
+) -> dict:
+
+    return asyncio.run(
+        download_dir_async(
+            token,
+            remote_dir,
+            local_dir,
+            batch=batch,
+            concurrency=concurrency,
+            max_retries=max_retries,
+        )
+    )
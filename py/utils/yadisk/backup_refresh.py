@@ -3,10 +3,15 @@ import yadisk
 
 from py.utils.db_related.cmd_utils import stop_db, run_sh
 from py.utils.db_related.db_utils import query_table
-from py.utils.yadisk.yadisk_utils import download_dir, delete_folder
+from py.utils.yadisk.yadisk_utils import delete_folder
+from py.utils.yadisk.backup_download import download_dir_sync
 from py.utils.general.dttm import shift_dt, parse_date
 
-def refresh_local_backup():
+def refresh_local_backup(restore_mode="full"):
+    """
+    restore_mode: "full" wipes the local db and restores everything,
+                  "delta" restores only collections whose dump files changed since the last restore
+    """
 
     client = yadisk.Client(token=os.environ["YANDEX_DISK_TOKEN"])
 
@@ -20,10 +25,10 @@ def refresh_local_backup():
 
 
     print(f"last date is {last_dt}, starting download...")
-    download_dir(client, f"/database/{folder_to_load}", "loaded_backup", 500)
+    download_dir_sync(os.environ["YANDEX_DISK_TOKEN"], f"/database/{folder_to_load}", "loaded_backup", 500)
     print("download is finished, starting new db")
 
-    run_sh("restore_db.sh")
+    run_sh("restore_db.sh", restore_mode)
     has_data = query_table('parsing_finish_dttms').shape[0] > 0
     stop_db()
     
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import pathlib
+
+import nest_asyncio
+import yadisk
+from tqdm.auto import tqdm
+
+from py.utils.general.file_hash import file_md5
+from py.utils.yadisk.async_utils import _field, _retry
+
+FILE_CACHE_DIR = pathlib.Path("cache/yadisk_files")
+CACHE_INDEX_NAME = "index.jsonl"  # remote path -> md5, one appended line per downloaded file
+
+
+class ContentCache:
+    """
+    Local content-addressed store: {cache_dir}/{md5[:2]}/{md5}, plus an appended
+    remote path -> md5 index of what each path held when it was downloaded.
+    """
+
+    def __init__(self, cache_dir=FILE_CACHE_DIR):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / CACHE_INDEX_NAME
+        self.path_to_md5 = {}
+
+        if self.index_path.exists():
+            with self.index_path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:  # torn last line of a killed run
+                        continue
+                    self.path_to_md5[record["path"]] = record["md5"]
+
+    def blob_path(self, md5) -> pathlib.Path:
+        return self.cache_dir / md5[:2] / md5
+
+    def lookup(self, remote_path, remote_md5) -> pathlib.Path | None:
+        """Blob of remote_path if it was downloaded and the remote file hasn't changed since."""
+        md5 = self.path_to_md5.get(remote_path)
+        if md5 is None or md5 != remote_md5:
+            return None
+        blob = self.blob_path(md5)
+        return blob if blob.exists() else None
+
+    def remember(self, remote_path, md5):
+        self.path_to_md5[remote_path] = md5
+        with self.index_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"path": remote_path, "md5": md5}, ensure_ascii=False) + "\n")
+
+
+def _materialize(blob: pathlib.Path, dst: pathlib.Path):
+    """Hard link the cached blob to dst (copy across filesystems)."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(blob, dst)
+    except OSError:
+        shutil.copyfile(blob, dst)
+
+
+async def download_files_async(
+    token: str,
+    pairs: list[tuple[str, str]],
+    concurrency: int = 16,
+    cache_dir=FILE_CACHE_DIR,
+) -> dict:
+    """
+    Downloads (remote_path, local_path) pairs over one AsyncClient session.
+      - md5 from get_meta, one call per distinct remote path (pairs with the same path share it)
+      - path in the cache index with that md5: served from the cache
+      - otherwise a blob with that md5 is reused, else the file is downloaded once
+      - at most `concurrency` files in flight, every call retried with _retry's backoff
+    A failed file doesn't stop the others; returns stats (cached / reused / downloaded / missing / failed).
+    """
+    cache = ContentCache(cache_dir)
+    stats = {"cached": 0, "reused": 0, "downloaded": 0, "missing": 0, "failed": 0}
+    started = time.monotonic()
+
+    async with yadisk.AsyncClient(token=token) as y:
+        sem = asyncio.Semaphore(concurrency)
+
+        inflight = {}  # remote path -> task, pairs with the same remote path share one download
+
+        async def fetch_blob(remote_path) -> str | None:
+            """Puts the file into the cache, returns its md5 (None if it doesn't exist)."""
+            async with sem:
+                try:
+                    meta = await _retry(lambda: y.get_meta(remote_path, fields=["md5", "type"]))
+                except yadisk.exceptions.PathNotFoundError:
+                    print(f"path {remote_path} does not exist")
+                    stats["missing"] += 1
+                    return None
+
+                md5 = _field(meta, "md5")
+                if md5 and cache.lookup(remote_path, md5) is not None:
+                    stats["cached"] += 1
+                    return md5
+                if md5 and cache.blob_path(md5).exists():
+                    stats["reused"] += 1
+                else:
+                    tmp = cache.cache_dir / f"{uuid.uuid4().hex}.part"
+
+                    async def download():
+                        # an open handle: without aiofiles, yadisk can't close a file it opened by path
+                        with open(tmp, "wb") as f:
+                            await y.download(remote_path, f)
+
+                    try:
+                        await _retry(download, measure_latency=False)
+                        local_md5 = await asyncio.to_thread(file_md5, tmp)
+                        if md5 and local_md5 != md5:
+                            raise ValueError(f"md5 mismatch for {remote_path}")
+
+                        md5 = local_md5
+                        cache.blob_path(md5).parent.mkdir(parents=True, exist_ok=True)
+                        tmp.replace(cache.blob_path(md5))
+                    finally:
+                        tmp.unlink(missing_ok=True)
+                    stats["downloaded"] += 1
+
+            cache.remember(remote_path, md5)
+            return md5
+
+        async def fetch(remote_path, local_path):
+            task = inflight.get(remote_path)
+            if task is None:
+                task = inflight[remote_path] = asyncio.create_task(fetch_blob(remote_path))
+            md5 = await task
+            if md5 is not None:
+                _materialize(cache.blob_path(md5), pathlib.Path(local_path))
+
+        async def guarded(remote_path, local_path):
+            try:
+                await fetch(remote_path, local_path)
+            except Exception as e:
+                print(f"[download error] {remote_path}: {e!r}")
+                stats["failed"] += 1
+
+        tasks = [asyncio.create_task(guarded(r, l)) for r, l in pairs]
+        for coro in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Downloading files"):
+            await coro
+
+    stats["seconds"] = time.monotonic() - started
+    print(", ".join(f"{k}: {v:.1f}" if isinstance(v, float) else f"{k}: {v}" for k, v in stats.items()))
+    return stats
+
+
+def download_files(pairs, concurrency=16, cache_dir=FILE_CACHE_DIR, token=None) -> dict:
+    # In notebook/REPL environments, nest_asyncio patches asyncio.run safely.
+    nest_asyncio.apply()
+    token = token or os.environ["YANDEX_DISK_TOKEN"]
+    return asyncio.run(download_files_async(token, pairs, concurrency=concurrency, cache_dir=cache_dir))
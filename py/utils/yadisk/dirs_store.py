@@ -0,0 +1,86 @@
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+DIRS_CSV_PATH = Path("yadisk_dirs.csv")
+DIRS_DB_PATH = Path("yadisk_dirs.sqlite")
+
+
+def build_dirs_store(csv_path=DIRS_CSV_PATH, db_path=DIRS_DB_PATH):
+    """
+    SQLite store built from yadisk_dirs.csv:
+        dirs(dir, offer_id, date)              -- every dir with its pre-parsed date
+        offer_dirs(offer_id, dt_type, dir, date) -- first / last dated dirs per offer (all dirs on a tie)
+    both indexed by offer_id. Written to a temp file and swapped in.
+    """
+    csv_path, db_path = Path(csv_path), Path(db_path)
+
+    df = pd.read_csv(csv_path, usecols=["dir", "offer_id"])
+    df["offer_id"] = pd.to_numeric(df["offer_id"], errors="coerce")
+    df = df.dropna(subset=["offer_id"])
+    df["offer_id"] = df["offer_id"].astype("int64")
+    df["date"] = pd.to_datetime(df["dir"].str.extract(r"_(\d{4}-\d{2}-\d{2})$")[0],
+                                format="%Y-%m-%d",
+                                errors="coerce"
+                 )
+
+    offer_dirs = []
+    for dt_type, fun in [("first", "min"), ("last", "max")]:
+        query_dt = df.groupby("offer_id")["date"].transform(fun)
+        single_df = df[df["date"] == query_dt].copy()
+        single_df["dt_type"] = dt_type
+        offer_dirs.append(single_df)
+    offer_dirs_df = pd.concat(offer_dirs, ignore_index=True)
+
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    offer_dirs_df["date"] = offer_dirs_df["date"].dt.strftime("%Y-%m-%d")
+
+    tmp_path = db_path.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    with sqlite3.connect(tmp_path) as con:
+        df[["dir", "offer_id", "date"]].to_sql("dirs", con, index=False)
+        offer_dirs_df[["offer_id", "dt_type", "dir", "date"]].to_sql("offer_dirs", con, index=False)
+        con.execute("CREATE INDEX dirs_offer_id ON dirs (offer_id)")
+        con.execute("CREATE INDEX offer_dirs_offer_id ON offer_dirs (offer_id, dt_type)")
+    con.close()
+    tmp_path.replace(db_path)
+
+    print(f"Saved {len(df)} dirs ({df['offer_id'].nunique()} offers) to {db_path}")
+
+
+def ensure_dirs_store(csv_path=DIRS_CSV_PATH, db_path=DIRS_DB_PATH):
+    """
+    Builds the store if it is missing or older than the csv.
+    """
+    csv_path, db_path = Path(csv_path), Path(db_path)
+    if not db_path.exists() or (csv_path.exists() and csv_path.stat().st_mtime > db_path.stat().st_mtime):
+        build_dirs_store(csv_path, db_path)
+
+
+def lookup_dirs(all_offer_ids, dt_type, db_path=DIRS_DB_PATH) -> pd.DataFrame:
+    """
+    First / last dated dirs for a set of offer ids: columns dir, offer_id, date, query_dt.
+    Ids go into a temp table and are joined against the index in one query.
+    """
+    if dt_type not in {"last", "first"}:
+        raise ValueError(f"unknown dt_type = '{dt_type}', only 'last' and 'first' are supported")
+
+    with sqlite3.connect(db_path) as con:
+        con.execute("CREATE TEMP TABLE query_ids (offer_id INTEGER PRIMARY KEY)")
+        con.executemany("INSERT OR IGNORE INTO query_ids VALUES (?)", ((int(x),) for x in all_offer_ids))
+
+        df = pd.read_sql_query(
+            """
+            SELECT d.dir, d.offer_id, d.date
+            FROM query_ids q
+            JOIN offer_dirs d ON d.offer_id = q.offer_id AND d.dt_type = ?
+            """,
+            con,
+            params=(dt_type,),
+        )
+    con.close()
+
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
+    df["query_dt"] = df["date"]
+    return df
@@ -0,0 +1,346 @@
+import time
+import random
+import asyncio
+import hashlib
+import secrets
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+import numpy as np
+import yadisk
+from aiohttp import web
+
+import py.utils.yadisk.photo_publish as photo_publish
+
+# local stand-in for the Yandex Disk REST API, for benchmarks without a token or the real service:
+#   GET  /v1/disk/resources                  meta + listing (limit / offset / sort)
+#   PUT  /v1/disk/resources/publish          publish
+#   GET  /v1/disk/resources/download         download link
+#   GET  /v1/disk/public/resources           public resource meta (sizes[ORIGINAL])
+#   GET  /v1/disk/public/resources/download  public download link
+#   GET  /files/{file_id}                    file body (what download links point to)
+
+
+def _disk_path(path: str) -> str:
+    """'disk:/a/b', '/a/b/' -> '/a/b'"""
+    path = path.removeprefix("disk:")
+    return "/" + path.strip("/") if path.strip("/") else "/"
+
+
+class FakeDisk:
+    """
+    In-memory tree: dirs and files with created timestamps, md5, public urls.
+    """
+
+    def __init__(self):
+        self.dirs = {"/": datetime(2025, 1, 1, tzinfo=timezone.utc)}
+        self.children = defaultdict(list)
+        self.files = {}          # path -> {"content", "md5", "created", "id"}
+        self.file_ids = {}       # id -> path
+        self.public = {}         # path -> public key
+        self.public_paths = {}   # public key -> path
+
+    def add_dir(self, path, created):
+        path = _disk_path(path)
+        if path in self.dirs:
+            return
+        parent = _disk_path(path.rsplit("/", 1)[0])
+        self.add_dir(parent, created)
+        self.dirs[path] = created
+        self.children[parent].append(path)
+
+    def add_file(self, path, content: bytes, created):
+        path = _disk_path(path)
+        parent = _disk_path(path.rsplit("/", 1)[0])
+        self.add_dir(parent, created)
+        file_id = secrets.token_hex(8)
+        self.files[path] = {"content": content, "md5": hashlib.md5(content).hexdigest(), "created": created, "id": file_id}
+        self.file_ids[file_id] = path
+        self.children[parent].append(path)
+
+    def publish(self, path, base_url) -> str:
+        if path not in self.public:
+            key = f"{base_url}/d/{secrets.token_urlsafe(12)}"
+            self.public[path] = key
+            self.public_paths[key] = path
+        return self.public[path]
+
+    def unpublish_all(self):
+        self.public.clear()
+        self.public_paths.clear()
+
+    def resource(self, path, base_url) -> dict:
+        is_dir = path in self.dirs
+        created = self.dirs[path] if is_dir else self.files[path]["created"]
+        res = {
+            "type": "dir" if is_dir else "file",
+            "name": path.rsplit("/", 1)[-1] or "disk",
+            "path": f"disk:{path}",
+            "created": created.isoformat(timespec="seconds"),
+            "modified": created.isoformat(timespec="seconds"),
+        }
+        if not is_dir:
+            res["md5"] = self.files[path]["md5"]
+            res["size"] = len(self.files[path]["content"])
+            res["mime_type"] = "application/octet-stream"
+        if path in self.public:
+            res["public_url"] = self.public[path]
+            res["public_key"] = self.public[path]
+        return res
+
+
+def build_photos_disk(n_offers=1_000, photos_per_offer=10, photo_size=32 * 1024, seed=0) -> FakeDisk:
+    """
+    /cian_project_photos/{rentflat|saleflat}{offer_id}_{YYYY-MM-DD}/{photos/N.jpg, page.html}, like the real folder.
+    """
+    rng = random.Random(seed)
+    disk = FakeDisk()
+    start = datetime(2025, 7, 1, tzinfo=timezone.utc)
+
+    photo = rng.randbytes(photo_size)
+    for i in range(n_offers):
+        created = start + timedelta(minutes=i)
+        deal = "rentflat" if i % 2 == 0 else "saleflat"
+        dir_path = f"/cian_project_photos/{deal}{300_000_000 + i}_{created.date()}"
+        disk.add_dir(dir_path, created)
+        disk.add_file(f"{dir_path}/page.html", f"<html>{i}</html>".encode(), created)
+        for j in range(photos_per_offer):
+            # same bytes with a per-file suffix: distinct md5s without generating MBs of randomness
+            disk.add_file(f"{dir_path}/photos/{j}.jpg", photo + f"{i}_{j}".encode(), created)
+
+    return disk
+
+
+class FakeYandexDisk:
+    """
+    aiohttp server over a FakeDisk with injected faults:
+        latency_s, latency_jitter_s: uniform service delay per request
+        error_rate: share of requests answered with 500
+        throttle_rate: share of requests answered with 429 (Retry-After: retry_after_s)
+        rps_limit: server-side request rate; requests above it get 429 too
+    Use as `async with FakeYandexDisk(disk) as server:`; while running, yadisk clients and
+    photo_publish.API_URL point to it. stats() gives per-endpoint request / status / latency counters.
+    """
+
+    def __init__(
+        self,
+        disk: FakeDisk,
+        latency_s=0.02,
+        latency_jitter_s=0.01,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after_s=1.0,
+        rps_limit=None,
+        host="127.0.0.1",
+        port=0,
+        seed=0,
+    ):
+        self.disk = disk
+        self.latency_s = latency_s
+        self.latency_jitter_s = latency_jitter_s
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after_s = retry_after_s
+        self.rps_limit = rps_limit
+        self.host, self.port = host, port
+        self.rng = random.Random(seed)
+
+        self.base_url = None
+        self._runner = None
+        self._patched = {}
+        self._bucket = (float(rps_limit or 0), time.monotonic())
+        self.reset_stats()
+
+    # -------------------- counters --------------------
+
+    def reset_stats(self):
+        self._started = time.monotonic()
+        self._requests = defaultdict(lambda: defaultdict(int))   # endpoint -> status -> count
+        self._latencies = defaultdict(list)                      # endpoint -> service seconds
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self._started
+        out = {}
+        for endpoint, statuses in self._requests.items():
+            latencies = np.array(self._latencies[endpoint], dtype=np.float64)
+            total = sum(statuses.values())
+            out[endpoint] = {
+                "requests": total,
+                "ok": statuses.get(200, 0) + statuses.get(201, 0) + statuses.get(206, 0),
+                "throttled": statuses.get(429, 0),
+                "errors": sum(v for k, v in statuses.items() if k >= 500),
+                "not_found": statuses.get(404, 0),
+                "rps": total / elapsed if elapsed > 0 else 0.0,
+                "latency_p50_s": float(np.quantile(latencies, 0.5)) if len(latencies) else np.nan,
+                "latency_p99_s": float(np.quantile(latencies, 0.99)) if len(latencies) else np.nan,
+            }
+        return out
+
+    # -------------------- fault injection --------------------
+
+    def _over_rps_limit(self) -> bool:
+        if not self.rps_limit:
+            return False
+        tokens, last = self._bucket
+        now = time.monotonic()
+        tokens = min(float(self.rps_limit), tokens + (now - last) * self.rps_limit)
+        if tokens < 1:
+            self._bucket = (tokens, now)
+            return True
+        self._bucket = (tokens - 1, now)
+        return False
+
+    @web.middleware
+    async def _faults(self, request, handler):
+        endpoint = request.match_info.route.resource.canonical if request.match_info.route.resource else "?"
+        started = time.monotonic()
+        try:
+            await asyncio.sleep(max(0.0, self.latency_s + self.rng.uniform(-1, 1) * self.latency_jitter_s))
+
+            if self._over_rps_limit() or self.rng.random() < self.throttle_rate:
+                response = web.json_response(
+                    {"error": "TooManyRequestsError", "message": "Too many requests", "description": "Too many requests"},
+                    status=429,
+                    headers={"Retry-After": f"{self.retry_after_s:g}"},
+                )
+            elif self.rng.random() < self.error_rate:
+                response = web.json_response(
+                    {"error": "InternalServerError", "message": "Internal error", "description": "Internal error"},
+                    status=500,
+                )
+            else:
+                response = await handler(request)
+        except web.HTTPException as e:
+            response = e
+
+        self._requests[endpoint][response.status] += 1
+        self._latencies[endpoint].append(time.monotonic() - started)
+        if isinstance(response, web.HTTPException):
+            raise response
+        return response
+
+    # -------------------- endpoints --------------------
+
+    def _not_found(self, path):
+        return web.json_response(
+            {"error": "DiskNotFoundError", "message": f"{path} not found", "description": "Resource not found."},
+            status=404,
+        )
+
+    async def _get_resources(self, request):
+        path = _disk_path(request.query.get("path", "/"))
+        disk = self.disk
+        if path not in disk.dirs and path not in disk.files:
+            return self._not_found(path)
+
+        res = disk.resource(path, self.base_url)
+        if path in disk.dirs:
+            limit = int(request.query.get("limit", 20))
+            offset = int(request.query.get("offset", 0))
+            sort = request.query.get("sort")
+
+            children = disk.children[path]
+            if sort in ("created", "-created"):
+                created = lambda p: disk.dirs[p] if p in disk.dirs else disk.files[p]["created"]
+                children = sorted(children, key=created, reverse=sort.startswith("-"))
+            elif sort in ("name", "-name"):
+                children = sorted(children, reverse=sort.startswith("-"))
+
+            res["_embedded"] = {
+                "items": [disk.resource(p, self.base_url) for p in children[offset:offset + limit]],
+                "limit": limit,
+                "offset": offset,
+                "total": len(children),
+                "path": res["path"],
+                "sort": sort or "",
+            }
+        return web.json_response(res)
+
+    async def _publish(self, request):
+        path = _disk_path(request.query.get("path", "/"))
+        if path not in self.disk.dirs and path not in self.disk.files:
+            return self._not_found(path)
+        self.disk.publish(path, self.base_url)
+        return web.json_response(
+            {"href": f"{self.base_url}/v1/disk/resources?path={quote(path)}", "method": "GET", "templated": False}
+        )
+
+    def _download_href(self, path):
+        return {"href": f"{self.base_url}/files/{self.disk.files[path]['id']}", "method": "GET", "templated": False}
+
+    async def _download_link(self, request):
+        path = _disk_path(request.query.get("path", "/"))
+        if path not in self.disk.files:
+            return self._not_found(path)
+        return web.json_response(self._download_href(path))
+
+    async def _get_public(self, request):
+        path = self.disk.public_paths.get(request.query.get("public_key"))
+        if path is None:
+            return self._not_found(request.query.get("public_key"))
+        res = self.disk.resource(path, self.base_url)
+        if path in self.disk.files:
+            href = self._download_href(path)["href"]
+            res["sizes"] = [{"name": "ORIGINAL", "url": href}, {"name": "DEFAULT", "url": href}]
+        return web.json_response(res)
+
+    async def _public_download_link(self, request):
+        path = self.disk.public_paths.get(request.query.get("public_key"))
+        if path is None or path not in self.disk.files:
+            return self._not_found(request.query.get("public_key"))
+        return web.json_response(self._download_href(path))
+
+    async def _file(self, request):
+        path = self.disk.file_ids.get(request.match_info["file_id"])
+        if path is None:
+            return self._not_found(request.match_info["file_id"])
+
+        content = self.disk.files[path]["content"]
+        range_header = request.headers.get("Range", "")
+        if range_header.startswith("bytes="):
+            start = int(range_header.removeprefix("bytes=").split("-")[0] or 0)
+            return web.Response(body=content[start:], status=206, content_type="application/octet-stream")
+        return web.Response(body=content, content_type="application/octet-stream")
+
+    # -------------------- lifecycle --------------------
+
+    def _app(self) -> web.Application:
+        app = web.Application(middlewares=[self._faults])
+        app.router.add_get("/v1/disk/resources", self._get_resources)
+        app.router.add_put("/v1/disk/resources/publish", self._publish)
+        app.router.add_get("/v1/disk/resources/download", self._download_link)
+        app.router.add_get("/v1/disk/public/resources", self._get_public)
+        app.router.add_get("/v1/disk/public/resources/download", self._public_download_link)
+        app.router.add_get("/files/{file_id}", self._file)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self._app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{self.host}:{port}"
+
+        # point the clients to the fake server
+        self._patched = {"BASE_API_URL": yadisk.settings.BASE_API_URL, "API_URL": photo_publish.API_URL}
+        yadisk.settings.BASE_API_URL = self.base_url
+        photo_publish.API_URL = f"{self.base_url}/v1/disk/public/resources"
+        return self
+
+    async def stop(self):
+        if self._patched:
+            yadisk.settings.BASE_API_URL = self._patched["BASE_API_URL"]
+            photo_publish.API_URL = self._patched["API_URL"]
+            self._patched = {}
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
@@ -2,6 +2,8 @@ import asyncio
 import nest_asyncio
 import aiohttp
 
+from py.utils.yadisk.rate_limiter import limited
+
 
 API_URL = "https://cloud-api.yandex.net/v1/disk/public/resources"
 
@@ -38,7 +40,7 @@ async def get_img_links(
         async def bound_task(idx, url):
             try:
                 async with sem:
-                    href = await _fetch_img_link(session, url, timeout=timeout)
+                    href = await limited(lambda: _fetch_img_link(session, url, timeout=timeout))
                 return idx, href, None
             except Exception as e:
                 return idx, None, e
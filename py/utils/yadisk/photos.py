@@ -3,13 +3,16 @@
 
 import os
 import asyncio
-import random
+from datetime import datetime
 import requests
 import pandas as pd
 from tqdm.auto import tqdm
 import nest_asyncio
 import yadisk
 
+from py.utils.yadisk.async_utils import _field, _listdir_paged, _retry
+from py.utils.yadisk.public_url_cache import PUBLIC_URL_DB_PATH, PublicUrlCache
+from py.utils.yadisk.rate_limiter import limited
 from py.utils.yadisk.yadisk_utils import get_dir_names
 
 
@@ -19,63 +22,33 @@ nest_asyncio.apply()
 # Helpers                                                                     #
 # --------------------------------------------------------------------------- #
 
-def _field(obj, key, default=None):
-    """Safely get attribute/field from YaDiskObject or dict."""
-    if obj is None:
-        return default
-    try:
-        return getattr(obj, key)
-    except AttributeError:
-        try:
-            return obj[key]
-        except Exception:
-            return default
-
-async def _retry(coro_factory, *, max_tries=5, base=0.5, cap=5.0):
-    """
-    Retry an awaited call with exponential backoff + jitter.
-    Respects HTTP 429 Retry-After if available on exception.response.
-    """
-    for attempt in range(1, max_tries + 1):
-        try:
-            return await coro_factory()
-        except Exception as e:
-            if attempt == max_tries:
-                raise
-            retry_after = None
-            try:
-                resp = getattr(e, "response", None)
-                if resp is not None:
-                    ra = resp.headers.get("Retry-After")
-                    if ra:
-                        retry_after = float(ra)
-            except Exception:
-                pass
-            delay = retry_after if retry_after is not None else min(cap, base * (2 ** (attempt - 1)))
-            # jitter ±40% around delay
-            jitter = delay * (0.6 + 0.8 * random.random())
-            await asyncio.sleep(jitter)
-
 async def is_published(y, path):
-    info = await y.get_meta(path, fields=["public_url", "public_key", "type"])
+    info = await limited(lambda: y.get_meta(path, fields=["public_url", "public_key", "type"]))
     return bool(_field(info, "public_url") or _field(info, "public_key"))
 
 # --------------------------------------------------------------------------- #
 # Core                                                                        #
 # --------------------------------------------------------------------------- #
 
-async def _gather_links_for_offer(y, offer_id, dir_path, files_concurrency: int = 8):
+async def _gather_links_for_offer(y, offer_id, dir_path, files_concurrency: int = 8, cache=None):
     """
     For a single offer directory:
+      - Dir complete in the public url cache: return cached links (0 calls)
       - Skip non-existent dir
       - Publish dir once if needed (non-fatal on failure)
       - List files, then process files concurrently (bounded)
-      - Use listing's public_url when present (0 extra calls)
+      - Use listing's or cache's public_url when present (0 extra calls)
       - Only publish files when needed; then fetch public_url once
+      - Save found urls to the cache, the dir is complete if every file got one
     """
     links = []
 
-    if not await y.exists(dir_path):
+    if cache is not None:
+        cached_links = cache.complete_dir_links(dir_path)
+        if cached_links is not None:
+            return offer_id, cached_links
+
+    if not await limited(lambda: y.exists(dir_path)):
         print(f"path {dir_path} does not exist")
         return offer_id, []
 
@@ -88,10 +61,10 @@ async def _gather_links_for_offer(y, offer_id, dir_path, files_concurrency: int
 
     items = []
     try:
-        async for item in y.listdir(dir_path, fields=["type", "path", "name", "public_url"]):
-            if (_field(item, "type", "") or "").lower() != "file":
-                continue
-            items.append(item)
+        items = [
+            item for item in await _listdir_paged(y, dir_path, ["type", "path", "name", "public_url"])
+            if (_field(item, "type", "") or "").lower() == "file"
+        ]
     except Exception as e:
         print(f"[listdir error] dir={dir_path}: {e!r}")
         return offer_id, links
@@ -99,45 +72,55 @@ async def _gather_links_for_offer(y, offer_id, dir_path, files_concurrency: int
     if not items:
         return offer_id, links
 
+    known_urls = cache.dir_urls(dir_path) if cache is not None else {}
     sem = asyncio.Semaphore(files_concurrency)
 
     async def process_item(item):
-        async with sem:
-            # Fast path: listing already provided a public URL
-            existing = _field(item, "public_url")
-            if existing:
-                return existing
+        """(file path, public_url or None, published_at or None)"""
+        file_path = _field(item, "path")
+
+        # Fast path: listing or cache already provided a public URL
+        existing = _field(item, "public_url") or known_urls.get(file_path)
+        if existing:
+            return file_path, existing, None
 
-            file_path = _field(item, "path")
-            if not file_path:
-                return None
+        if not file_path:
+            return file_path, None, None
 
+        async with sem:
             try:
                 # Check if already public
                 meta = await _retry(lambda: y.get_meta(file_path, fields=["public_url", "public_key"]))
                 already = _field(meta, "public_url")
                 if already:
-                    return already
+                    return file_path, already, None
 
                 # Publish then fetch public_url once
                 await _retry(lambda: y.publish(file_path))
+                published_at = datetime.now().isoformat(timespec="seconds")
                 meta2 = await _retry(lambda: y.get_meta(file_path, fields=["public_url"]))
                 url = _field(meta2, "public_url")
                 if url:
-                    return url
+                    return file_path, url, published_at
 
                 print(f"No public URL after publish for {_field(item,'name')} in {dir_path}")
-                return None
+                return file_path, None, None
 
             except Exception as e:
                 print(f"[file error] {dir_path}/{_field(item,'name')}: {e!r}")
-                return None
+                return file_path, None, None
 
+    found = {}
     tasks = [asyncio.create_task(process_item(it)) for it in items]
     for fut in asyncio.as_completed(tasks):
-        url = await fut
+        file_path, url, published_at = await fut
         if url:
             links.append(url)
+            if file_path:
+                found[file_path] = (url, published_at)
+
+    if cache is not None:
+        cache.save_dir(dir_path, found, complete=len(found) == len(items))
 
     # Dedup, preserve order
     seen, deduped = set(), []
@@ -148,7 +131,7 @@ async def _gather_links_for_offer(y, offer_id, dir_path, files_concurrency: int
 
     return offer_id, deduped
 
-async def _run_async(df_in, dt_type, concurrency, token, files_concurrency=8):
+async def _run_async(df_in, dt_type, concurrency, token, files_concurrency=8, cache=None):
     # Resolve directory names for unique offers
     unique_offers = pd.Series(df_in["offer_id"].unique(), name="offer_id")
     dir_df = get_dir_names(unique_offers.tolist(), dt_type=dt_type)
@@ -172,7 +155,8 @@ async def _run_async(df_in, dt_type, concurrency, token, files_concurrency=8):
         async def guarded_task(offer_id, dir_path):
             async with sem:
                 try:
-                    return await _gather_links_for_offer(y, offer_id, dir_path, files_concurrency=files_concurrency)
+                    return await _gather_links_for_offer(y, offer_id, dir_path, files_concurrency=files_concurrency,
+                                                         cache=cache)
                 except Exception as e:
                     print(f"[task error] offer_id={offer_id} dir={dir_path}: {e!r}")
                     return (offer_id, [])
@@ -212,12 +196,18 @@ def get_public_links_for_photos_df(
     concurrency=20,
     token=os.environ["YANDEX_DISK_TOKEN"],
     files_concurrency=8,  # per-directory parallelism, tune 4..16
+    cache_path=PUBLIC_URL_DB_PATH,  # persistent path -> public_url cache, None to disable
 ):
-    # In notebook/REPL environments, nest_asyncio patches asyncio.run safely.
-    return asyncio.run(
-        _run_async(df, dt_type=dt_type, concurrency=concurrency,
-                   token=token, files_concurrency=files_concurrency)
-    )
+    cache = PublicUrlCache(cache_path) if cache_path is not None else None
+    try:
+        # In notebook/REPL environments, nest_asyncio patches asyncio.run safely.
+        return asyncio.run(
+            _run_async(df, dt_type=dt_type, concurrency=concurrency,
+                       token=token, files_concurrency=files_concurrency, cache=cache)
+        )
+    finally:
+        if cache is not None:
+            cache.close()
 
 def get_img_link(public_url):
     """
@@ -0,0 +1,86 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+PUBLIC_URL_DB_PATH = Path("yadisk_public_urls.sqlite")
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class PublicUrlCache:
+    """
+    Persistent Yandex Disk path -> public_url store:
+        files(path, dir_path, public_url, published_at, cached_at)
+            published_at: when we published the file, NULL if it was already public
+        dirs(dir_path, complete, checked_at)
+            complete = 1: every file of the dir has its public_url in files,
+            so the dir needs no API call at all (photo dirs are dated and never change)
+    """
+
+    def __init__(self, db_path=PUBLIC_URL_DB_PATH):
+        self.con = sqlite3.connect(db_path)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                dir_path TEXT NOT NULL,
+                public_url TEXT NOT NULL,
+                published_at TEXT,
+                cached_at TEXT NOT NULL
+            )
+        """)
+        self.con.execute("CREATE INDEX IF NOT EXISTS files_dir_path ON files (dir_path)")
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                dir_path TEXT PRIMARY KEY,
+                complete INTEGER NOT NULL,
+                checked_at TEXT NOT NULL
+            )
+        """)
+        self.con.commit()
+
+    def close(self):
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def complete_dir_links(self, dir_path) -> list[str] | None:
+        """Public urls of a complete dir (ordered by file path), None if the dir has to be processed."""
+        row = self.con.execute("SELECT complete FROM dirs WHERE dir_path = ?", (dir_path,)).fetchone()
+        if row is None or not row[0]:
+            return None
+        return [url for _, url in self.dir_urls(dir_path).items()]
+
+    def dir_urls(self, dir_path) -> dict[str, str]:
+        """{file path: public_url} known for a dir."""
+        rows = self.con.execute(
+            "SELECT path, public_url FROM files WHERE dir_path = ? ORDER BY path", (dir_path,)
+        ).fetchall()
+        return dict(rows)
+
+    def save_dir(self, dir_path, urls: dict[str, tuple[str, str | None]], complete: bool):
+        """
+        urls: {file path: (public_url, published_at)} found for the dir in this run.
+        One transaction per dir.
+        """
+        now = _now()
+        with self.con:
+            self.con.executemany(
+                """
+                INSERT INTO files (path, dir_path, public_url, published_at, cached_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    public_url = excluded.public_url,
+                    published_at = COALESCE(excluded.published_at, files.published_at),
+                    cached_at = excluded.cached_at
+                """,
+                [(path, dir_path, url, published_at, now) for path, (url, published_at) in urls.items()],
+            )
+            self.con.execute(
+                "INSERT OR REPLACE INTO dirs (dir_path, complete, checked_at) VALUES (?, ?, ?)",
+                (dir_path, int(complete), now),
+            )
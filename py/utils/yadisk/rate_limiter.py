@@ -0,0 +1,217 @@
+import time
+import asyncio
+import threading
+from collections import deque
+
+import numpy as np
+
+# shared by every Yandex Disk call of the process (dirs listing, photos publishing, downloads...)
+RATE_START = 20.0          # requests / s
+RATE_MIN, RATE_MAX = 1.0, 200.0
+BURST = 20                 # token bucket size
+CONCURRENCY_START = 16.0
+CONCURRENCY_MIN, CONCURRENCY_MAX = 1.0, 128.0
+DECREASE_FACTOR = 0.5      # multiplicative decrease on 429
+LATENCY_TARGET_S = 2.0     # slower successful calls shrink the window a little
+LATENCY_DECREASE_FACTOR = 0.9
+DEFAULT_COOLDOWN_S = 1.0   # pause after a 429 without Retry-After
+
+
+def _status_of(e) -> int | None:
+    """HTTP status of a yadisk / aiohttp exception, if any."""
+    status = getattr(e, "status", None)  # aiohttp.ClientResponseError
+    if status is None:
+        resp = getattr(e, "response", None)
+        status = getattr(resp, "status", None) or getattr(resp, "status_code", None)
+    if status is None and type(e).__name__ in ("TooManyRequestsError", "ResourceDownloadLimitExceededError"):
+        status = 429
+    return status
+
+
+def retry_after_of(e) -> float | None:
+    """Retry-After seconds of a failed call, if the response had one."""
+    try:
+        headers = getattr(e, "headers", None)  # aiohttp.ClientResponseError
+        if headers is None:
+            resp = getattr(e, "response", None)
+            headers = getattr(resp, "headers", None)
+        ra = headers.get("Retry-After") if headers is not None else None
+        return float(ra) if ra else None
+    except Exception:
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket (requests / s) + AIMD concurrency window:
+      - success: rate and window grow additively (about +1 per window of calls),
+        unless the call was slower than latency_target_s, then the window shrinks slightly
+      - 429: rate and window are halved and nobody starts a call until Retry-After passes
+    State is process-wide; callers waiting for a slot hold a future of their own event loop,
+    woken thread-safely on release, so the limiter can be shared by code that runs its own asyncio.run.
+    """
+
+    def __init__(
+        self,
+        rate=RATE_START,
+        burst=BURST,
+        concurrency=CONCURRENCY_START,
+        latency_target_s=LATENCY_TARGET_S,
+    ):
+        self.rate = float(rate)
+        self.burst = burst
+        self.concurrency = float(concurrency)
+        self.latency_target_s = latency_target_s
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._cooldown_until = 0.0
+        self._in_flight = 0
+        self._waiters = []  # (loop, future) of callers waiting for a free slot
+
+        self.reset_stats()
+
+    # -------------------- counters --------------------
+
+    def reset_stats(self):
+        with self._lock:
+            self._started = time.monotonic()
+            self._counts = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0}
+            self._latencies = deque(maxlen=10_000)
+
+    def stats(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            latencies = np.array(self._latencies, dtype=np.float64)
+            return {
+                **self._counts,
+                "in_flight": self._in_flight,
+                "rate": self.rate,
+                "concurrency": self.concurrency,
+                "throughput_rps": self._counts["ok"] / elapsed if elapsed > 0 else 0.0,
+                "latency_p50_s": float(np.quantile(latencies, 0.5)) if len(latencies) else np.nan,
+                "latency_p95_s": float(np.quantile(latencies, 0.95)) if len(latencies) else np.nan,
+                "latency_p99_s": float(np.quantile(latencies, 0.99)) if len(latencies) else np.nan,
+            }
+
+    # -------------------- acquire / release --------------------
+
+    def _try_take(self, now) -> float | None:
+        """Takes a slot and a token, or returns how long to wait (None means until a release)."""
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+        if now < self._cooldown_until:
+            return self._cooldown_until - now
+        if self._in_flight >= int(self.concurrency):
+            return None
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        self._tokens -= 1
+        self._in_flight += 1
+        self._counts["requests"] += 1
+        return 0.0
+
+    async def acquire(self):
+        """
+        Sleeps exactly until the cooldown ends or the bucket has a token again;
+        with the window full, waits for the next release instead.
+        """
+        while True:
+            with self._lock:
+                wait = self._try_take(time.monotonic())
+                if wait is None:
+                    loop = asyncio.get_running_loop()
+                    fut = loop.create_future()
+                    self._waiters.append((loop, fut))
+            if wait == 0.0:
+                return
+
+            if wait is None:
+                await fut
+            else:
+                await asyncio.sleep(wait)
+
+    def _wake_waiters(self):
+        """Wakes every caller waiting for a slot, they retake it in _try_take."""
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_set_done, fut)
+            except RuntimeError:  # that loop is closed
+                pass
+
+    def release(self, latency_s, status=None, retry_after=None, measure_latency=True):
+        """status: None for success, HTTP status (or -1 for a non-HTTP error) otherwise."""
+        with self._lock:
+            self._in_flight -= 1
+
+            if status is None:
+                self._counts["ok"] += 1
+                if measure_latency:
+                    self._latencies.append(latency_s)
+
+                if measure_latency and latency_s > self.latency_target_s:
+                    self.concurrency = max(CONCURRENCY_MIN, self.concurrency * LATENCY_DECREASE_FACTOR)
+                else:
+                    self.concurrency = min(CONCURRENCY_MAX, self.concurrency + 1 / self.concurrency)
+                    self.rate = min(RATE_MAX, self.rate + 1 / self.concurrency)
+
+            elif status == 429:
+                self._counts["throttled"] += 1
+                self.concurrency = max(CONCURRENCY_MIN, self.concurrency * DECREASE_FACTOR)
+                self.rate = max(RATE_MIN, self.rate * DECREASE_FACTOR)
+                pause = retry_after if retry_after is not None else DEFAULT_COOLDOWN_S
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + pause)
+                self._tokens = 0.0
+
+            else:
+                self._counts["errors"] += 1
+
+        self._wake_waiters()
+
+    async def call(self, coro_factory, measure_latency=True):
+        """
+        Runs one API call under the limiter. measure_latency=False for calls whose
+        duration is mostly payload transfer (downloads), so they don't shrink the window.
+        """
+        await self.acquire()
+        started = time.monotonic()
+        status, retry_after = None, None
+        try:
+            return await coro_factory()
+        except BaseException as e:  # cancellation included, the slot must be given back
+            status = _status_of(e)
+            status = status if status is not None else -1
+            retry_after = retry_after_of(e)
+            raise
+        finally:
+            self.release(time.monotonic() - started, status=status, retry_after=retry_after,
+                         measure_latency=measure_latency)
+
+
+def _set_done(fut):
+    if not fut.done():  # a cancelled waiter
+        fut.set_result(None)
+
+
+_LIMITER = AdaptiveRateLimiter()
+
+
+def get_limiter() -> AdaptiveRateLimiter:
+    return _LIMITER
+
+
+def set_limiter(limiter: AdaptiveRateLimiter) -> AdaptiveRateLimiter:
+    """Replaces the process-wide limiter (e.g. a fresh one per benchmark run), returns the previous one."""
+    global _LIMITER
+    previous, _LIMITER = _LIMITER, limiter
+    return previous
+
+
+async def limited(coro_factory, measure_latency=True):
+    """Shortcut: run coro_factory() under the process-wide limiter."""
+    return await _LIMITER.call(coro_factory, measure_latency=measure_latency)
@@ -1,6 +1,7 @@
 import os
 import json
 import asyncio
+from datetime import datetime
 from pathlib import Path
 
 import nest_asyncio
@@ -10,9 +11,117 @@ from tqdm.asyncio import tqdm_asyncio
 import aiohttp
 from yadisk.exceptions import YaDiskError
 
-CHECKPOINT_PATH = Path("yadisk_dirs_checkpoint.json")
+from py.utils.yadisk.dirs_store import build_dirs_store
+from py.utils.yadisk.rate_limiter import get_limiter, limited
+
+CHECKPOINT_PATH = Path("yadisk_dirs_checkpoint.jsonl")
+STATE_PATH = Path("yadisk_dirs_state.json")
 RESULT_CSV_PATH = Path("yadisk_dirs.csv")
 
+REFRESH_MODES = ("full", "incremental")
+
+
+# -------------------- CHECKPOINT / STATE --------------------
+
+def _append_checkpoint(mode: str, off: int, entries: list[tuple[str, str]]) -> None:
+    """One JSON line per finished page, appended (not rewritten)."""
+    with CHECKPOINT_PATH.open("a", encoding="utf-8") as f:
+        f.write(json.dumps({"mode": mode, "offset": off, "entries": entries}, ensure_ascii=False) + "\n")
+
+
+def _read_checkpoint(mode: str) -> tuple[set[int], list[tuple[str, str]]]:
+    """
+    (processed offsets, (name, created) entries) of an interrupted run.
+    Entries are kept whatever the mode, offsets only for the same mode (pages are sorted differently).
+    """
+    processed_offsets, entries = set(), []
+    if not CHECKPOINT_PATH.exists():
+        return processed_offsets, entries
+
+    with CHECKPOINT_PATH.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:  # torn last line of a killed run
+                continue
+            if record["mode"] == mode:
+                processed_offsets.add(record["offset"])
+            entries.extend(tuple(e) for e in record["entries"])
+
+    return processed_offsets, entries
+
+
+def _read_state() -> dict | None:
+    """Boundary of the last successful refresh: newest created + dir names with exactly that created."""
+    if not STATE_PATH.exists():
+        return None
+    return json.loads(STATE_PATH.read_text())
+
+
+def _write_state(entries: list[tuple[str, str]], prev_state: dict | None) -> None:
+    created = [c for _, c in entries if c]
+    if prev_state is not None:
+        created.append(prev_state["last_created"])
+    if not created:
+        return
+
+    last_created = max(created, key=datetime.fromisoformat)
+    boundary_names = {n for n, c in entries if c and datetime.fromisoformat(c) == datetime.fromisoformat(last_created)}
+    if prev_state is not None and prev_state["last_created"] == last_created:
+        boundary_names |= set(prev_state["boundary_names"])
+
+    STATE_PATH.write_text(
+        json.dumps({"last_created": last_created, "boundary_names": sorted(boundary_names)}, ensure_ascii=False)
+    )
+
+
+# -------------------- LISTING --------------------
+
+async def _fetch_page(
+    y: yadisk.AsyncClient,
+    sem: asyncio.Semaphore,
+    path: str,
+    off: int,
+    batch: int,
+    max_retries: int,
+    base_delay: float,
+    sort: str | None = None,
+) -> tuple[int, list[tuple[str, str]]]:
+    """One page of (name, created iso) with retry + backoff."""
+    attempt = 0
+    delay = base_delay
+
+    while True:
+        attempt += 1
+        try:
+            async def list_page():
+                return [
+                    (obj["name"], obj["created"].isoformat() if obj["created"] else None)
+                    async for obj in y.listdir(
+                        path,
+                        type="dir",
+                        limit=batch,
+                        offset=off,
+                        max_items=batch,  # this page only, listdir would otherwise page on to the end
+                        sort=sort,
+                        fields=["name", "created"],
+                    )
+                ]
+
+            async with sem:
+                entries = await limited(list_page)
+            return off, entries
+
+        except (aiohttp.ClientError, YaDiskError, asyncio.TimeoutError) as e:
+            if attempt >= max_retries:
+                # final failure – propagate
+                print(f"Offset {off}: giving up after {attempt} attempts ({e})")
+                raise
+            print(f"Offset {off}: attempt {attempt} failed ({e}), "
+                  f"retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+            delay *= 2  # exponential backoff
+
 
 async def get_dirs_async(
     token: str,
@@ -22,10 +131,11 @@ async def get_dirs_async(
     max_retries: int = 10,
     base_delay: float = 1.0,
     processed_offsets: set[int] | None = None,
-) -> tuple[list[str], set[int]]:
+) -> tuple[list[tuple[str, str]], set[int]]:
     """
+    Full listing, pages fetched concurrently.
     Returns:
-        dirs_this_run: list of folder names fetched in THIS run
+        entries_this_run: (name, created) of folders fetched in THIS run
         all_processed_offsets: updated set of processed offsets (including previous + this run)
     """
 
@@ -35,7 +145,7 @@ async def get_dirs_async(
     async with yadisk.AsyncClient(token=token) as y:
 
         # get total items
-        meta = await y.get_meta(path, fields=["_embedded.total"])
+        meta = await limited(lambda: y.get_meta(path, fields=["_embedded.total"]))
         total = meta["embedded"]["total"]  
 
         sem = asyncio.Semaphore(concurrency)
@@ -50,74 +160,103 @@ async def get_dirs_async(
               f"already done: {len(processed_offsets)}, "
               f"to fetch now: {len(offsets_to_fetch)}")
 
-        async def fetch_page(off: int) -> tuple[int, list[str]]:
-            """One page with retry + backoff."""
-            attempt = 0
-            delay = base_delay
-
-            while True:
-                attempt += 1
-                try:
-                    async with sem:
-                        names = [
-                            obj["name"]
-                            async for obj in y.listdir(
-                                path,
-                                type="dir",
-                                limit=batch,
-                                offset=off,
-                                fields=["name"],
-                            )
-                        ]
-                    return off, names
-
-                except (aiohttp.ClientError, YaDiskError, asyncio.TimeoutError) as e:
-                    if attempt >= max_retries:
-                        # final failure – propagate
-                        print(f"Offset {off}: giving up after {attempt} attempts ({e})")
-                        raise
-                    print(f"Offset {off}: attempt {attempt} failed ({e}), "
-                          f"retrying in {delay:.1f}s...")
-                    await asyncio.sleep(delay)
-                    delay *= 2  # exponential backoff
-
         # create tasks only for offsets we still need
-        tasks = [asyncio.create_task(fetch_page(off)) for off in offsets_to_fetch]
+        tasks = [
+            asyncio.create_task(_fetch_page(y, sem, path, off, batch, max_retries, base_delay))
+            for off in offsets_to_fetch
+        ]
 
-        dirs_this_run: list[str] = []
+        entries_this_run: list[tuple[str, str]] = []
         all_processed_offsets = set(processed_offsets)
 
         # consume tasks as they complete, with progress bar
         for coro in tqdm_asyncio.as_completed(tasks, desc="Fetching pages"):
-            off, names = await coro
-            dirs_this_run.extend(names)
+            off, entries = await coro
+            entries_this_run.extend(entries)
             all_processed_offsets.add(off)
 
-            # update checkpoint on every page (cheap and safe)
-            CHECKPOINT_PATH.write_text(
-                json.dumps(sorted(all_processed_offsets), ensure_ascii=False)
-            )
+            # append the page to the checkpoint (cheap and safe)
+            _append_checkpoint("full", off, entries)
+
+        return entries_this_run, all_processed_offsets
+
+
+async def get_new_dirs_async(
+    token: str,
+    state: dict,
+    path: str = "/cian_project_photos",
+    batch: int = 1_000,
+    max_retries: int = 10,
+    base_delay: float = 1.0,
+) -> list[tuple[str, str]]:
+    """
+    Delta listing: pages sorted by created, newest first, until the boundary of the
+    last successful refresh is reached. Dirs created while listing shift the pages
+    down, so entries may repeat but none are skipped.
+    """
+    last_created = datetime.fromisoformat(state["last_created"])
+    boundary_names = set(state["boundary_names"])
+
+    sem = asyncio.Semaphore(1)
+    new_entries: list[tuple[str, str]] = []
+
+    async with yadisk.AsyncClient(token=token) as y:
+        off = 0
+        while True:
+            _, entries = await _fetch_page(y, sem, path, off, batch, max_retries, base_delay, sort="-created")
+            _append_checkpoint("incremental", off, entries)
 
-        return dirs_this_run, all_processed_offsets
+            reached_boundary = False
+            for name, created in entries:
+                created_dt = datetime.fromisoformat(created) if created else None
+                if created_dt is None or created_dt > last_created:
+                    new_entries.append((name, created))
+                elif created_dt == last_created and name not in boundary_names:
+                    new_entries.append((name, created))
+                elif created_dt < last_created:
+                    reached_boundary = True
 
+            if reached_boundary or len(entries) < batch:
+                break
+            off += batch
+
+    print(f"Incremental: {len(new_entries)} dirs created since {state['last_created']}")
+    return new_entries
+
+
+def refresh_yadisk_dirs(mode: str = "incremental"):
+    """
+    mode="incremental" lists only dirs created since the last successful refresh
+    (falls back to "full" if there is no previous refresh); mode="full" re-lists the whole folder.
+    """
+    if mode not in REFRESH_MODES:
+        raise ValueError(f"unknown mode = '{mode}', only {REFRESH_MODES} are supported")
 
-def refresh_yadisk_dirs():
     nest_asyncio.apply()
 
-    # 1. Load which offsets we already processed (if any)
-    if CHECKPOINT_PATH.exists():
-        processed_offsets = set(json.loads(CHECKPOINT_PATH.read_text()))
-    else:
-        processed_offsets = set()
+    state = _read_state()
+    if mode == "incremental" and (state is None or not RESULT_CSV_PATH.exists()):
+        print("No previous refresh found, running a full one")
+        mode = "full"
+
+    # 1. Load what an interrupted run already fetched (if any)
+    processed_offsets, checkpoint_entries = _read_checkpoint(mode)
 
-    # 2. Run async fetch (will only fetch missing offsets)
-    new_dirs, all_processed_offsets = asyncio.run(
-        get_dirs_async(
-            os.environ["YANDEX_DISK_TOKEN"],
-            "/cian_project_photos",
-            processed_offsets=processed_offsets,
+    # 2. Run async fetch (full: only missing offsets, incremental: only the newest pages)
+    if mode == "full":
+        new_entries, all_processed_offsets = asyncio.run(
+            get_dirs_async(
+                os.environ["YANDEX_DISK_TOKEN"],
+                "/cian_project_photos",
+                processed_offsets=processed_offsets,
+            )
         )
-    )
+    else:
+        new_entries = asyncio.run(get_new_dirs_async(os.environ["YANDEX_DISK_TOKEN"], state, "/cian_project_photos"))
+        all_processed_offsets = set()
+
+    new_entries = checkpoint_entries + new_entries
+    new_dirs = {name for name, _ in new_entries}
 
     # 3. Load existing dirs from previous runs
     if RESULT_CSV_PATH.exists():
@@ -138,16 +277,16 @@ def refresh_yadisk_dirs():
         .str.replace("saleflat", "", regex=False)
     )
 
-    # 5. Save final CSV
+    # 5. Save final CSV + indexed offer_id -> dir store
     df.to_csv(RESULT_CSV_PATH, index=False)
+    build_dirs_store(RESULT_CSV_PATH)
 
-    # 6. Run completed successfully: checkpoint is no longer needed
-    try:
-        CHECKPOINT_PATH.unlink(missing_ok=True)
-    except FileNotFoundError:
-        pass
+    # 6. Run completed successfully: remember the boundary, checkpoint is no longer needed
+    _write_state(new_entries, state)
+    CHECKPOINT_PATH.unlink(missing_ok=True)
 
     print(
-        f"Saved {len(df)} dirs to {RESULT_CSV_PATH}, "
+        f"Saved {len(df)} dirs to {RESULT_CSV_PATH} ({len(new_dirs - old_dirs)} new, mode={mode}), "
         f"{len(all_processed_offsets)} pages marked done."
     )
+    print(f"Yandex Disk calls: {get_limiter().stats()}")
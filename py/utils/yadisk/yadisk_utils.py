@@ -1,7 +1,8 @@
-import os
 import yadisk
 import pathlib 
-import pandas as pd
+
+from py.utils.yadisk.bulk_download import download_files
+from py.utils.yadisk.dirs_store import ensure_dirs_store, lookup_dirs
 
 def download_dir(client, 
                  remote_dir, 
@@ -47,35 +48,23 @@ def delete_folder(client: yadisk.Client,
 
 
 def get_dir_names(all_offer_ids, dt_type):
+    # indexed store built by refresh_yadisk_dirs, rebuilt here if yadisk_dirs.csv is newer
+    ensure_dirs_store()
+    return lookup_dirs(all_offer_ids, dt_type)
 
-    if dt_type not in {"last", "first"}:
-        raise ValueError(f"unknown dt_type = '{dt_type}', only 'last' and 'first' are supported")
-
-    fun = 'max' if dt_type == 'last' else 'min'
-
-
-    df = pd.read_csv("yadisk_dirs.csv")
-    df["date"] = pd.to_datetime(df["dir"].str.extract(r"_(\d{4}-\d{2}-\d{2})$")[0],   
-                                format="%Y-%m-%d",
-                                errors="coerce"                                      
-                 )
-
-    df["query_dt"] = (
-        df
-        .groupby("offer_id")["date"]      
-        .transform(fun)               
-    )
-
-
-    df.query("offer_id in @all_offer_ids and date == query_dt")
-    filtered_df = df.query("offer_id in @all_offer_ids and date == query_dt")
-
-    return filtered_df
+def load_file(all_offer_ids, filename, dt_type = "last", output_dir = "html_load", skip_missing = False):
 
-def load_file(all_offer_ids, filename, dt_type = "last", output_dir = "html_load"):
-    
     filtered_df = get_dir_names(all_offer_ids, dt_type = dt_type)
 
-    for dir_name, offer_id in zip(filtered_df["dir"], filtered_df["offer_id"]):
-        with yadisk.Client(token=os.environ["YANDEX_DISK_TOKEN"]) as client:
-            client.download(f"/cian_project_photos/{dir_name}/{filename}", f'{output_dir}/{offer_id}')
+    # one async session for all files; already downloaded files come from the local content cache
+    pairs = [
+        (f"/cian_project_photos/{dir_name}/{filename}", f"{output_dir}/{offer_id}")
+        for dir_name, offer_id in zip(filtered_df["dir"], filtered_df["offer_id"])
+    ]
+    stats = download_files(pairs)
+    if stats["failed"]:
+        raise RuntimeError(f"{stats['failed']} of {len(pairs)} files failed to download")
+    # offers without the file only print a warning with skip_missing=True
+    if stats["missing"] and not skip_missing:
+        raise FileNotFoundError(f"{stats['missing']} of {len(pairs)} files do not exist on the disk")
+    return stats
@@ -0,0 +1,188 @@
+import os
+import time
+import shutil
+import asyncio
+import pathlib
+import tempfile
+from datetime import datetime, timezone
+
+# never let a benchmark run touch the real disk: the clients only see a fake token
+os.environ["YANDEX_DISK_TOKEN"] = "fake-token"
+
+import pandas as pd
+import yadisk
+
+import py.utils.yadisk.photos as photos
+from py.utils.yadisk.backup_download import download_dir_async
+from py.utils.yadisk.bulk_download import download_files_async
+from py.utils.yadisk.fake_server import FakeYandexDisk, build_photos_disk
+from py.utils.yadisk.photo_publish import get_img_links
+from py.utils.yadisk.rate_limiter import AdaptiveRateLimiter, set_limiter
+from py.utils.yadisk.refresh_local_yadisk_dirs import get_dirs_async
+from py.utils.yadisk.yadisk_utils import download_dir
+
+OUT_DIR = pathlib.Path("csv/benchmarks").absolute()
+TOKEN = os.environ["YANDEX_DISK_TOKEN"]
+
+N_OFFERS = 1_000          # dirs in /cian_project_photos
+PHOTOS_PER_OFFER = 4
+PUBLISH_OFFERS = 25       # offers published from scratch by the links workload
+IMG_LINKS = 300           # public urls resolved by get_img_links
+BACKUP_FILES = 100        # files of the dir downloaded by download_dir
+LOAD_FILES = 200          # page.html files fetched like load_file does
+LIST_BATCH = 50           # page size of the dirs listing
+
+CONCURRENCY_GRID = [1, 4, 16, 64]
+SCENARIOS = {
+    "clean": dict(latency_s=0.02, latency_jitter_s=0.01),
+    "slow_tail": dict(latency_s=0.05, latency_jitter_s=0.045),
+    "flaky": dict(latency_s=0.02, latency_jitter_s=0.01, error_rate=0.05),
+    "throttled": dict(latency_s=0.02, latency_jitter_s=0.01, throttle_rate=0.02, retry_after_s=0.5),
+    "server_rps_limit": dict(latency_s=0.02, latency_jitter_s=0.01, rps_limit=100, retry_after_s=0.2),
+}
+
+
+# -------------------- WORKLOADS --------------------
+# each one runs the repo's own code against the fake server, returns (items done, items expected)
+
+async def list_dirs(server, concurrency):
+    entries, _ = await get_dirs_async(TOKEN, "/cian_project_photos", batch=LIST_BATCH,
+                                      concurrency=concurrency, max_retries=5, base_delay=0.1)
+    return len({name for name, _ in entries}), N_OFFERS
+
+
+async def publish_links(server, concurrency, offers_df):
+    server.disk.unpublish_all()
+    out = await photos._run_async(offers_df, dt_type="first", concurrency=concurrency,
+                                  token=TOKEN, files_concurrency=8, cache=None)
+    return int(out["photo_urls"].str.len().sum()), len(offers_df) * PHOTOS_PER_OFFER
+
+
+async def img_links(server, concurrency, file_paths):
+    public_urls = [server.disk.publish(p, server.base_url) for p in file_paths]
+    results = await get_img_links(public_urls, timeout=30, max_concurrency=concurrency, return_errors=True)
+    return sum(isinstance(r, str) for r in results), len(public_urls)
+
+
+async def download_backup(server, concurrency, remote_dir, local_root):
+    local_dir = local_root / "async"
+    shutil.rmtree(local_dir, ignore_errors=True)  # otherwise every run after the first only skips files
+    try:
+        stats = await download_dir_async(TOKEN, remote_dir, local_dir, batch=LIST_BATCH,
+                                         concurrency=concurrency, max_retries=5, base_delay=0.1)
+        done = stats["files"] + stats["skipped"]
+    except Exception as e:
+        print(f"download_dir_async failed: {e!r}")
+        done = sum(1 for p in local_dir.iterdir() if p.is_file() and not p.name.endswith(".part"))
+    return done, BACKUP_FILES
+
+
+async def load_files(server, concurrency, pairs, local_root):
+    # fresh content cache, otherwise every run after the first only checks md5s and downloads nothing
+    shutil.rmtree(local_root, ignore_errors=True)
+    stats = await download_files_async(TOKEN, pairs, concurrency=concurrency, cache_dir=local_root / "cache")
+    return len(pairs) - stats["failed"] - stats["missing"], len(pairs)
+
+
+async def download_backup_sync(server, concurrency, remote_dir, local_root):
+    # the old sequential download_dir on the sync client, as a baseline; in a thread, the server shares the loop
+    local_dir = local_root / "sync"
+    shutil.rmtree(local_dir, ignore_errors=True)
+    with yadisk.Client(token=TOKEN) as client:
+        await asyncio.to_thread(download_dir, client, remote_dir, local_dir, LIST_BATCH)
+    return sum(1 for p in local_dir.iterdir() if p.is_file()), BACKUP_FILES
+
+
+# -------------------- RUN --------------------
+
+async def run_one(server, workload, fun, scenario, concurrency):
+    limiter = AdaptiveRateLimiter()
+    set_limiter(limiter)
+    server.reset_stats()
+
+    started = time.monotonic()
+    done, expected = await fun(server, concurrency)
+    seconds = time.monotonic() - started
+
+    server_stats = server.stats()
+    server_requests = sum(s["requests"] for s in server_stats.values())
+    row = {
+        "workload": workload,
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "seconds": seconds,
+        "done": done,
+        "expected": expected,
+        "items_per_s": done / seconds,
+        "server_requests": server_requests,
+        "server_rps": server_requests / seconds,
+        "server_throttled": sum(s["throttled"] for s in server_stats.values()),
+        "server_errors": sum(s["errors"] for s in server_stats.values()),
+        **{f"client_{k}": v for k, v in limiter.stats().items()},
+    }
+    print(f"{workload:>20} {scenario:>16} c={concurrency:<3} {seconds:7.2f}s "
+          f"{done}/{expected} done, {row['server_rps']:.0f} req/s, "
+          f"p99 {row['client_latency_p99_s'] * 1000:.0f} ms, limiter rate {limiter.rate:.0f}/s")
+    return row
+
+
+async def main(work_dir: pathlib.Path):
+    disk = build_photos_disk(n_offers=N_OFFERS, photos_per_offer=PHOTOS_PER_OFFER)
+
+    backup_dir = "/cian_backup_benchmark"
+    now = datetime.now(timezone.utc)
+    for i in range(BACKUP_FILES):
+        disk.add_file(f"{backup_dir}/{i}.bin", os.urandom(64 * 1024), now)
+
+    # offer_id -> dir lookups of photos._run_async go through the local yadisk_dirs.csv store
+    dir_names = [p.rsplit("/", 1)[-1] for p in disk.children["/cian_project_photos"]]
+    dirs_df = pd.DataFrame({"dir": dir_names})
+    dirs_df["offer_id"] = dirs_df["dir"].str.extract(r"(\d+)_")[0]
+    dirs_df.to_csv("yadisk_dirs.csv", index=False)
+    offers_df = dirs_df.head(PUBLISH_OFFERS)[["offer_id"]].astype({"offer_id": "int64"})
+
+    file_paths = [p for p in disk.files if p.startswith("/cian_project_photos/") and p.endswith(".jpg")][:IMG_LINKS]
+
+    load_pairs = [
+        (f"{dir_path}/page.html", (work_dir / "html_load" / str(i)).as_posix())
+        for i, dir_path in enumerate(disk.children["/cian_project_photos"][:LOAD_FILES])
+    ]
+
+    workloads = {
+        "list_dirs": list_dirs,
+        "publish_links": lambda s, c: publish_links(s, c, offers_df),
+        "img_links": lambda s, c: img_links(s, c, file_paths),
+        "download_dir_async": lambda s, c: download_backup(s, c, backup_dir, work_dir / "backup"),
+        "download_files": lambda s, c: load_files(s, c, load_pairs, work_dir / "html_load"),
+    }
+
+    rows = []
+    for scenario, faults in SCENARIOS.items():
+        async with FakeYandexDisk(disk, **faults) as server:
+            print(f"--- {scenario} on {server.base_url}: {faults}")
+            for workload, fun in workloads.items():
+                for concurrency in CONCURRENCY_GRID:
+                    rows.append(await run_one(server, workload, fun, scenario, concurrency))
+
+            if scenario == "clean":
+                sync_fun = lambda s, c: download_backup_sync(s, c, backup_dir, work_dir / "backup")
+                rows.append(await run_one(server, "download_dir_sync", sync_fun, scenario, 1))
+
+    return pd.DataFrame(rows)
+
+
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp:
+    # checkpoints, dirs store and downloads of the benchmark stay out of the working tree
+    os.chdir(tmp)
+    try:
+        results_df = asyncio.run(main(pathlib.Path(tmp)))
+    finally:
+        os.chdir(cwd)
+
+summary_df = results_df.pivot_table(index=["workload", "concurrency"], columns="scenario",
+                                    values="items_per_s", sort=False)
+print(summary_df.round(1).to_string())
+
+OUT_DIR.mkdir(parents=True, exist_ok=True)
+results_df.to_csv(OUT_DIR / "yadisk_calls.csv", index=False)
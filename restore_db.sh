@@ -5,6 +5,17 @@ set -euo pipefail
 CONTAINER="mongo"  # name for the MongoDB container on THIS laptop
 DATA_DIR="/home/kardinal/projects/cian_project_part2/db"  # fresh data dir on THIS laptop
 BACKUP_ROOT="/home/kardinal/projects/cian_project_part2/loaded_backup"  # where dump_* folders live
+MANIFEST="$BACKUP_ROOT/.restore_manifest"  # data dir + md5 of dump files from the last successful restore
+PARALLEL=4  # collections restored in parallel (and md5sum workers)
+
+# ==== Mode: full (default) | delta ====
+# delta keeps the existing data dir, restores only collections whose dump files changed
+# and drops collections that are gone from the dump
+MODE="${1:-full}"
+if [[ "$MODE" != "full" && "$MODE" != "delta" ]]; then
+  echo "❌ Unknown mode '$MODE' (expected 'full' or 'delta')"
+  exit 1
+fi
 
 # ==== Pick latest backup ====
 LATEST_DUMP=$(ls -d "$BACKUP_ROOT"/dump_* 2>/dev/null | sort -V | tail -n1 || true)
@@ -14,19 +25,70 @@ if [[ -z "${LATEST_DUMP}" ]]; then
 fi
 echo "🗂 Using backup: $LATEST_DUMP"
 
+# ==== Checksum manifest of the dump ====
+# first line: the data dir the dump was restored into, then "<md5>  ./<db>/<file>" per dump file
+NEW_MANIFEST="$(mktemp)"
+trap 'rm -f "$NEW_MANIFEST"' EXIT
+
+echo "🔎 Computing dump checksums..."
+echo "# data_dir $DATA_DIR" > "$NEW_MANIFEST"
+(
+  cd "$LATEST_DUMP"
+  find . -type f \( -name '*.bson' -o -name '*.metadata.json' \) -print0 \
+    | xargs -0 -r -n 16 -P "$PARALLEL" md5sum
+) | sort -k2 >> "$NEW_MANIFEST"
+
+# md5 lines of a manifest, without the header
+checksums() { grep -v '^#' "$1" | sort; }
+
+# "<md5>  ./<db>/<coll>.bson" lines -> "<db>.<coll>"
+to_ns() {
+  awk '{print $2}' \
+    | sed -E 's#^\./##; s#\.metadata\.json$##; s#\.bson$##; s#/#.#' \
+    | sort -u
+}
+
+if [[ "$MODE" == "delta" ]]; then
+  if [[ ! -f "$MANIFEST" ]]; then
+    echo "⚠️ No previous manifest, falling back to full restore"
+    MODE="full"
+  elif [[ "$(head -n1 "$MANIFEST")" != "# data_dir $DATA_DIR" ]]; then
+    echo "⚠️ Previous manifest is not for $DATA_DIR, falling back to full restore"
+    MODE="full"
+  elif [[ -z "$(ls -A "$DATA_DIR" 2>/dev/null)" ]]; then
+    echo "⚠️ Data dir is empty, falling back to full restore"
+    MODE="full"
+  fi
+fi
+
+CHANGED_NS=()
+DROPPED_NS=()
+if [[ "$MODE" == "delta" ]]; then
+  # every file whose md5/path pair is new
+  mapfile -t CHANGED_NS < <(comm -23 <(checksums "$NEW_MANIFEST") <(checksums "$MANIFEST") | to_ns)
+  # collections restored last time that have no files in this dump
+  mapfile -t DROPPED_NS < <(comm -23 <(checksums "$MANIFEST" | to_ns) <(checksums "$NEW_MANIFEST" | to_ns))
+  echo "🧮 Changed collections: ${#CHANGED_NS[@]}"
+  for ns in "${CHANGED_NS[@]}"; do echo "   - $ns"; done
+  echo "🧮 Dropped collections: ${#DROPPED_NS[@]}"
+  for ns in "${DROPPED_NS[@]}"; do echo "   - $ns"; done
+fi
+
 # ==== Sanity check before we rm -rf ====
 if [[ -z "$DATA_DIR" || "$DATA_DIR" == "/" ]]; then
   echo "❌ Refusing to wipe dangerous DATA_DIR='$DATA_DIR'"
   exit 1
 fi
 
-# ==== Start fresh MongoDB ====
-echo "🧹 Clearing old data dir via docker (handles permissions)..."
+# ==== Start fresh MongoDB (delta mode keeps the data dir) ====
 mkdir -p "$DATA_DIR"
 
-docker run --rm \
-  -v "$DATA_DIR:/data/db" \
-  busybox sh -c 'rm -rf /data/db/* /data/db/.[!.]* /data/db/..?*'
+if [[ "$MODE" == "full" ]]; then
+  echo "🧹 Clearing old data dir via docker (handles permissions)..."
+  docker run --rm \
+    -v "$DATA_DIR:/data/db" \
+    busybox sh -c 'rm -rf /data/db/* /data/db/.[!.]* /data/db/..?*'
+fi
 
 
 # Remove any old container with same name
@@ -71,7 +133,26 @@ if [[ "$READY" -ne 1 ]]; then
 fi
 
 # ==== Restore ====
-echo "📥 Restoring from dump into fresh Mongo..."
-docker exec "$CONTAINER" mongorestore --drop /dump
+# mongorestore rebuilds indexes from *.metadata.json after loading each collection
+if [[ "$MODE" == "full" ]]; then
+  echo "📥 Restoring from dump into fresh Mongo..."
+  docker exec "$CONTAINER" mongorestore --drop --numParallelCollections="$PARALLEL" /dump
+elif [[ "${#CHANGED_NS[@]}" -eq 0 && "${#DROPPED_NS[@]}" -eq 0 ]]; then
+  echo "✨ Nothing changed since the last restore"
+else
+  for ns in "${DROPPED_NS[@]}"; do
+    echo "🗑 Dropping $ns"
+    docker exec "$CONTAINER" mongosh --quiet --eval \
+      "db.getSiblingDB('${ns%%.*}').getCollection('${ns#*.}').drop()" >/dev/null
+  done
+  if [[ "${#CHANGED_NS[@]}" -gt 0 ]]; then
+    echo "📥 Restoring ${#CHANGED_NS[@]} changed collections..."
+    NS_ARGS=()
+    for ns in "${CHANGED_NS[@]}"; do NS_ARGS+=("--nsInclude=$ns"); done
+    docker exec "$CONTAINER" mongorestore --drop --numParallelCollections="$PARALLEL" "${NS_ARGS[@]}" /dump
+  fi
+fi
+
+cp "$NEW_MANIFEST" "$MANIFEST"
 
 echo "✅ Restore complete. Mongo is running at mongodb://localhost:27018"